@@ -1,5 +1,7 @@
 import streamlit as st
-from PIL import Image
+
+from utils.assets import logo
+from utils.sidebar import reload_data_button
 
 st.set_page_config(
     page_title='Home',
@@ -8,13 +10,15 @@ st.set_page_config(
 st.set_page_config( page_title = 'Home', layout='wide')
 
 #image_path = '/Users/felip/Desktop/Comunidade DS/FTC/final_project/'
-image = Image.open('logo.png')
-
-st.sidebar.image(image, width=120)
+# Logo reduzido, gerado uma única vez (ver utils/assets.py)
+st.sidebar.image(logo(), width=120)
 
 st.sidebar.markdown('# Fome Zero')
 st.sidebar.markdown('''---''')
 
+# Recarga manual da base (ver utils/sidebar.py)
+reload_data_button()
+
 st.write('# Fome Zero Dashboard')
 
 st.markdown(
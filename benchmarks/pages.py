@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from utils.aggregates import PARTIAL_TABLES, build_country_aggregates
+from utils.data import DATA_PATH, STREAMING_MIN_BYTES, clean_data
+from utils.facets import build_facet_index
+from utils.schema import compact
+from utils.search import build_search_index
+from utils.streaming import stream_aggregates
+from utils.synthetic import generate
+from utils.views import cities_view, countries_view, cuisines_view, overview_view
+
+#------------------------------------------------------------------------------------------------------------
+# Benchmark das etapas das páginas
+#
+# Mede, fora do Streamlit, cada etapa do caminho de uma página: leitura do CSV, limpeza, esquema compacto
+# (ver utils/schema.py), agregados por país, índices da Overview e o cálculo dos resultados de cada página
+# (ver utils/views.py) com todos os países selecionados. Roda sobre a base do projeto e sobre bases
+# sintéticas 10x, 100x e 1000x maiores (ver utils/synthetic.py): mesmas distribuições, mas com nomes e
+# coordenadas novos, então o índice de busca e os agregados de nomes distintos crescem como cresceriam com
+# dados reais, e não só com cópias das mesmas linhas.
+#
+# A partir de STREAMING_MIN_BYTES as páginas de agregados usam o modo streaming (ver utils/data.py), e o
+# benchmark segue o mesmo caminho: a carga vira uma única etapa `stream` e a Overview, que precisa das linhas
+# em memória, não é medida.
+#
+# Cada etapa roda até `--repeat` vezes (menos se passar de MAX_STAGE_SECONDS no total) e vale o menor tempo.
+# Os tempos são comparados com os de BASELINE_PATH; uma etapa mais lenta que REGRESSION_RATIO vezes a
+# baseline (e por mais de REGRESSION_MIN_SECONDS) é marcada como regressão e o comando termina com erro.
+#
+#     python -m benchmarks.pages                        # 1x, 10x e 100x contra a baseline
+#     python -m benchmarks.pages --scales 1 10 100 1000
+#     python -m benchmarks.pages --save                 # grava os tempos medidos como nova baseline
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Bases sintéticas ampliadas (geradas uma vez, ver .gitignore)
+SCALED_DIR = 'dataset/bench'
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_REPEAT = 5
+MAX_STAGE_SECONDS = 30
+
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_SECONDS = 0.005
+
+#------------------------------------------------------------------------------------------------------------
+# Bases ampliadas
+
+def scaled_csv(scale, source=DATA_PATH, directory=SCALED_DIR):
+    if scale == 1:
+        return source
+
+    path = os.path.join(directory, f'synthetic_x{scale}.csv')
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source):
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    rows = len(pd.read_csv(source, usecols=['Restaurant ID']))
+
+    # Escreve em um arquivo temporário: uma geração interrompida não é reaproveitada
+    partial = path + '.partial'
+    generate(partial, rows * scale, source)
+    os.replace(partial, path)
+
+    return path
+
+#------------------------------------------------------------------------------------------------------------
+# Etapas
+
+def _time(func, repeat):
+    timings = []
+
+    while len(timings) < repeat and sum(timings) < MAX_STAGE_SECONDS:
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), result
+
+# Agregados prontos para consulta: as tabelas parciais e a tabela por cidade são compactadas na leitura
+def _aggregates(build):
+    aggregates = build()
+
+    for name in PARTIAL_TABLES:
+        getattr(aggregates, name)
+    aggregates.cities
+
+    return aggregates
+
+def run_scale(path, repeat=DEFAULT_REPEAT, log=print):
+    timings = {}
+
+    def stage(name, func):
+        seconds, result = _time(func, repeat)
+        timings[name] = round(seconds, 6)
+        log(f'  {name:<14} {timings[name] * 1000:>12.1f} ms')
+
+        return result
+
+    streaming = os.path.getsize(path) >= STREAMING_MIN_BYTES
+
+    if streaming:
+        aggregates = stage('stream', lambda: _aggregates(lambda: stream_aggregates(path)))
+    else:
+        raw = stage('read_csv', lambda: pd.read_csv(path))
+        cleaned = stage('clean', lambda: clean_data(raw))
+        df = stage('compact', lambda: compact(cleaned))
+        aggregates = stage('aggregates', lambda: _aggregates(lambda: build_country_aggregates(df)))
+        facet_index = stage('facet_index', lambda: build_facet_index(df))
+        stage('search_index', lambda: build_search_index(df))
+
+    selected = list(aggregates.countries.index)
+    cuisine = 'Italian'
+
+    if not streaming:
+        stage('overview', lambda: overview_view(aggregates, facet_index, selected))
+    stage('countries', lambda: countries_view(aggregates, selected))
+    stage('cities', lambda: cities_view(aggregates, selected, cuisine))
+    stage('cuisines', lambda: cuisines_view(aggregates, selected))
+    stage('cuisines_listed', lambda: cuisines_view(aggregates, selected, listed=True))
+
+    return {'rows': int(aggregates.rows), 'timings': timings}
+
+#------------------------------------------------------------------------------------------------------------
+# Comparação com a baseline
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        return json.load(file)
+
+def compare(results, baseline):
+    rows = []
+
+    for scale, result in results.items():
+        base = baseline.get(str(scale), {}).get('timings', {})
+
+        for name, seconds in result['timings'].items():
+            before = base.get(name)
+            ratio = seconds / before if before else None
+            regression = (
+                ratio is not None
+                and ratio > REGRESSION_RATIO
+                and seconds - before > REGRESSION_MIN_SECONDS
+            )
+
+            rows.append({
+                'Scale': f'{scale}x',
+                'Stage': name,
+                'Time (ms)': round(seconds * 1000, 1),
+                'Baseline (ms)': round(before * 1000, 1) if before else None,
+                'Ratio': round(ratio, 2) if ratio is not None else None,
+                'Regression': regression,
+            })
+
+    return pd.DataFrame(rows)
+
+#------------------------------------------------------------------------------------------------------------
+# CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every page stage on the dataset and on scaled copies of it.')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='dataset multipliers (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per stage, best is kept (default: %(default)s)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON (default: %(default)s)')
+    parser.add_argument('--save', action='store_true', help='store the measured timings as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for scale in args.scales:
+        path = scaled_csv(scale)
+        print(f'{scale}x ({path})')
+        results[scale] = run_scale(path, args.repeat)
+
+    baseline = load_baseline(args.baseline)
+    report = compare(results, baseline)
+    print()
+    print(report.to_string(index=False))
+
+    if args.save:
+        # Escalas não medidas nesta execução continuam com a baseline anterior
+        baseline.update({str(scale): result for scale, result in results.items()})
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f'\nBaseline saved to {args.baseline}')
+        return 0
+
+    if report['Regression'].any():
+        print(f'\nStages slower than {REGRESSION_RATIO}x the baseline: {int(report["Regression"].sum())}')
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
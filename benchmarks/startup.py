@@ -0,0 +1,84 @@
+import argparse
+import ast
+import glob
+import statistics
+import subprocess
+import sys
+
+import pandas as pd
+
+#------------------------------------------------------------------------------------------------------------
+# Tempo de início de cada página
+#
+# Cada medida roda em um processo Python novo, como o primeiro acesso a uma página depois de subir o app:
+# importa os módulos do topo do script (imports) e executa o script uma vez, sem navegador, com o AppTest do
+# Streamlit (first run: carga da base, índices, gráficos, logo). Vale a mediana de `--runs` processos.
+#
+#     python -m benchmarks.startup
+#     python -m benchmarks.startup --runs 5 pages/2_Countries.py
+
+SCRIPTS = ['Home.py', *sorted(glob.glob('pages/*.py'))]
+
+DEFAULT_RUNS = 3
+
+_CHILD = '''
+import importlib
+import sys
+import time
+
+start = time.perf_counter()
+for module in sys.argv[2:]:
+    importlib.import_module(module)
+imports = time.perf_counter() - start
+
+from streamlit.testing.v1 import AppTest
+
+start = time.perf_counter()
+AppTest.from_file(sys.argv[1], default_timeout=600).run()
+print(imports, time.perf_counter() - start)
+'''
+
+# Módulos importados no topo do script
+def script_imports(script):
+    with open(script, encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+
+    return modules
+
+def measure(script):
+    output = subprocess.run(
+        [sys.executable, '-c', _CHILD, script, *script_imports(script)],
+        capture_output=True, text=True, check=True
+    ).stdout
+
+    imports, first_run = map(float, output.split()[-2:])
+
+    return imports, first_run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time imports and the first run of each page in fresh processes.')
+    parser.add_argument('scripts', nargs='*', default=SCRIPTS, help='page scripts (default: Home.py and pages/*.py)')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='fresh processes per script, median is kept (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    rows = []
+    for script in args.scripts:
+        imports, first_run = zip(*[measure(script) for _ in range(args.runs)])
+        rows.append({
+            'Script': script,
+            'Imports (ms)': round(statistics.median(imports) * 1000, 1),
+            'First run (ms)': round(statistics.median(first_run) * 1000, 1),
+            'Total (ms)': round(statistics.median(i + r for i, r in zip(imports, first_run)) * 1000, 1),
+        })
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -1,106 +1,49 @@
-import pandas as pd
 import streamlit as st
-import plotly.express as px
 import folium
 from streamlit_folium import st_folium
-from IPython.display import display
 
-#------------------------------------------------------------------------------------------------------------
-# Base carregada
-
-df = pd.read_csv('dataset/zomato.csv')
+from utils.aggregates import build_country_aggregates
+from utils.assets import logo
+from utils.cache import build_view_cache, selection_key
+from utils.data import get_index, get_store, warm_index
+from utils.geo import nearest, within_radius
+from utils.facets import build_facet_index, facet_key, facet_sidebar, filtered_aggregates
+from utils.maps import (
+    build_grid_index,
+    build_restaurant_lookup,
+    clicked_restaurant_id,
+    nearby_layer,
+    restaurant_details,
+    view_bounds,
+    viewport_layer,
+)
+from utils.metrics import debug_panel, finish_trace, span, start_trace
+from utils.search import build_search_index
+from utils.views import overview_view
 
 #------------------------------------------------------------------------------------------------------------
-# Funções
-
-COUNTRIES = {
-1: "India",
-14: "Australia",
-30: "Brazil",
-37: "Canada",
-94: "Indonesia",
-148: "New Zeland",
-162: "Philippines",
-166: "Qatar",
-184: "Singapure",
-189: "South Africa",
-191: "Sri Lanka",
-208: "Turkey",
-214: "United Arab Emirates",
-215: "England",
-216: "United States of America",
-}
-def country_name(country_id):
-    return COUNTRIES[country_id]
-
-def create_price_type(price_range):
-    if price_range == 1:
-        return "cheap"
-    elif price_range == 2:
-        return "normal"
-    elif price_range == 3:
-        return "expensive"
-    else:
-        return "gourmet"
-
-COLORS = {
-"3F7E00": "darkgreen",
-"5BA829": "green",
-"9ACD32": "lightgreen",
-"CDD614": "orange",
-"FFBA00": "red",
-"CBCBC8": "darkred",
-"FF7800": "darkred",
-}
-def color_name(color_code):
-    return COLORS[color_code]
-
-def filter_max(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_max = df_filter['Aggregate rating'].max()
-    
-    df_max_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_max].head(1)
-    
-    return df_max_restaurant
-
-def filter_min(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_min = df_filter['Aggregate rating'].min()
-    
-    df_min_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_min].head(1)
-    
-    return df_min_restaurant
+# Tempos desta execução da página, por etapa (ver utils/metrics.py)
+start_trace('Overview')
 
 #------------------------------------------------------------------------------------------------------------
-# Bloco limpeza e tratamento de dados
-
-# Início da limpeza, retirando possíveis espaços a mais nos campos object
-
-cols = df.select_dtypes(include=['object']).columns
-
-df[cols] = df[cols].select_dtypes(include=['object']).apply(lambda x: x.str.strip())
-
-# Redefinindo a base com a exclusão dos dados NaN na coluna Cuisine. Métodos de imputação foram testados porém não foram efetivos
+# Base carregada (lida e tratada uma única vez por processo, ver utils/data.py). A base e todas as estruturas
+# vêm da mesma versão, fixada no início do rerun: um lote novo só aparece no rerun seguinte
 
-df = df[df['Cuisines'].notna()]
+store = get_store()
+df = store.df
 
-# Eliminar linhas duplicadas
+# Agregados parciais por país, combinados a cada mudança do filtro (ver utils/aggregates.py)
+aggregates = get_index(store, build_country_aggregates)
 
-df = df.drop_duplicates()
+# Resultados por seleção de países, compartilhados entre reruns e sessões (ver utils/cache.py)
+view_cache = get_index(store, build_view_cache)
 
-df['Country Name'] = df['Country Code'].apply(lambda x: country_name(x))
-df['Price Type'] = df['Price range'].apply(lambda x: create_price_type(x))
-df['Color Name'] = df['Rating color'].apply(lambda x: color_name(x))
-df['Cuisines Unique'] = df.loc[:, "Cuisines"].apply(lambda x: x.split(",")[0])
-
-
-# Correção nome dos países que estavam incorretos
-
-df['Country Name'] = df['Country Name'].str.replace('Singapure','Singapore')
-df['Country Name'] = df['Country Name'].str.replace('New Zeland','New Zealand')
+# Bitmaps dos filtros adicionais da sidebar (ver utils/facets.py)
+facet_index = get_index(store, build_facet_index)
 
+# Índice de busca (segundos em bases grandes) construído em segundo plano, sem atrasar a página; a busca só
+# espera o que faltar (ver utils/search.py)
+warm_index(store, build_search_index)
 
 # =====================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -121,19 +64,27 @@ st.set_page_config(
 # SIDEBAR
 # =====================================
 with st.sidebar:
-    st.image('logo.png', use_container_width=True)
+    st.image(logo(), use_container_width=True)
     st.markdown('---')
 
     # Filtro por país (default: todos)
-    countries = sorted(df['Country Name'].unique())
+    countries = list(aggregates.countries.index)
     selected_countries = st.multiselect(
         'Countries:',
         options=countries,
         default=countries
     )
 
-# Aplica filtro
-filtered_df = df[df['Country Name'].isin(selected_countries)]
+    # Filtros adicionais: KPIs e mapa passam a considerar só as linhas filtradas
+    facets = facet_sidebar(facet_index)
+    aggregates = filtered_aggregates(df, aggregates, facet_index, facets, view_cache)
+
+# Aplica filtro (KPIs, centro do mapa e máscara dos restaurantes dos países selecionados, ver utils/views.py)
+with span('view'):
+    view = view_cache.get_or_compute(
+        selection_key('overview', selected_countries, facet_key(facets)),
+        lambda: overview_view(aggregates, facet_index, selected_countries, facets)
+    )
 
 # =====================================
 # TÍTULOS
@@ -146,11 +97,13 @@ st.markdown('We have the following key figures on our platform:')
 # =====================================
 # KPIs
 # =====================================
-restaurantes_unicos = filtered_df['Restaurant Name'].nunique()
-paises_unicos = filtered_df['Country Name'].nunique()
-cidades_unicas = filtered_df['City'].nunique()
-total_aval = filtered_df['Votes'].sum()
-tipo_culinaria = filtered_df['Cuisines Unique'].nunique()
+kpis = view['kpis']
+
+restaurantes_unicos = kpis['restaurants']
+paises_unicos = kpis['countries']
+cidades_unicas = kpis['cities']
+total_aval = kpis['votes']
+tipo_culinaria = kpis['cuisines']
 
 col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -162,46 +115,110 @@ col5.metric('Cuisines', tipo_culinaria)
 
 st.markdown('---')
 
+# =====================================
+# BUSCA
+# =====================================
+# Índice de trigramas de nome, localidade e endereço (ver utils/search.py); respeita os filtros da sidebar
+SEARCH_RESULT_COLUMNS = ['Restaurant Name', 'City', 'Country Name', 'Locality', 'Cuisines', 'Aggregate rating', 'Votes']
+
+search_query = st.text_input('Search restaurants by name or address:')
+
+if search_query:
+    with span('search'), st.spinner('Indexing restaurants...'):
+        positions, scores = get_index(store, build_search_index).search(search_query, mask=view['country_mask'])
+
+    if len(positions):
+        st.dataframe(
+            df.iloc[positions][SEARCH_RESULT_COLUMNS].assign(Score=scores.round(2)),
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.markdown('No restaurants found.')
+
+st.markdown('---')
+
 # =====================================
 # MAPA
 # =====================================
-# Garante cor HEX válida
-filtered_df['rating_color_hex'] = '#' + filtered_df['Rating color'].astype(str)
+# Zoom e retângulo visíveis na última interação com o mapa (vazio no primeiro render)
+map_view = st.session_state.get('overview_map') or {}
+map_zoom = map_view.get('zoom') or 3
 
 # Centro do mapa
-map_center = [
-    filtered_df['Latitude'].mean(),
-    filtered_df['Longitude'].mean()
-]
+map_center = view['map_center']
 
 # Criação do mapa
-m = folium.Map(
-    location=map_center,
-    zoom_start=3,
-    tiles='OpenStreetMap'
-)
+with span('map'):
+    m = folium.Map(
+        location=map_center,
+        zoom_start=3,
+        tiles='OpenStreetMap'
+    )
 
-# Pontos no mapa
-for _, row in filtered_df.iterrows():
-    folium.CircleMarker(
-        location=[row['Latitude'], row['Longitude']],
-        radius=4,
-        color=row['rating_color_hex'],
-        fill=True,
-        fill_color=row['rating_color_hex'],
-        fill_opacity=0.9,
-        popup=folium.Popup(
-            f"""
-            <b>{row['Restaurant Name']}</b><br>
-            País: {row.get('Country Name', 'N/A')}<br>
-            Cidade: {row.get('City', 'N/A')}<br>
-            Nota média: {row.get('Aggregate rating', 'N/A')}
-            """,
-            max_width=300
-        )
-    ).add_to(m)
+# Pontos no mapa: agregados por célula com zoom baixo e restaurantes individuais da área visível com zoom
+# alto (ver utils/maps.py). A camada é trocada sem recriar o mapa, mantendo a posição do usuário.
+grid_index = get_index(store, build_grid_index)
+
+with span('map'):
+    restaurants = folium.FeatureGroup(name='Restaurants')
+    viewport_layer(df, grid_index, view['country_mask'], map_zoom, view_bounds(map_view.get('bounds'))).add_to(restaurants)
+
+# Restaurantes próximos ao último ponto clicado no mapa (ver utils/geo.py): dentro de um raio ou os N mais
+# próximos, respeitando os filtros da sidebar e a nota mínima
+st.markdown('### Nearby Restaurants')
+st.markdown('Click on the map to choose a point.')
+
+col1, col2, col3, col4 = st.columns(4)
+nearby_mode = col1.radio('Search:', ['Within radius', 'Nearest'], horizontal=True)
+radius_km = col2.number_input('Radius (km):', min_value=0.1, value=2.0, step=0.5)
+nearest_n = col3.number_input('Restaurants:', min_value=1, max_value=100, value=10)
+min_rating = col4.slider('Minimum rating:', min_value=0.0, max_value=5.0, value=4.0, step=0.1)
+
+clicked_point = map_view.get('last_clicked')
+nearby = None
+
+if clicked_point:
+    with span('nearby'):
+        point = (clicked_point['lat'], clicked_point['lng'])
+        nearby_mask = view['country_mask'] & (df['Aggregate rating'].to_numpy() >= min_rating)
+
+        if nearby_mode == 'Within radius':
+            nearby_rows, nearby_distances = within_radius(grid_index, *point, radius_km, nearby_mask)
+            nearby_radius = radius_km
+        else:
+            nearby_rows, nearby_distances = nearest(grid_index, *point, int(nearest_n), nearby_mask)
+            nearby_radius = nearby_distances[-1] if len(nearby_distances) else 0
+
+        nearby_layer(df, nearby_rows, point, nearby_radius).add_to(restaurants)
+        nearby = df.iloc[nearby_rows][SEARCH_RESULT_COLUMNS].assign(**{'Distance (km)': nearby_distances.round(2)})
+
+# Exibição do mapa no Streamlit (o st_folium serializa o mapa e a camada a cada execução)
+with span('st_folium'):
+    map_value = st_folium(
+        m,
+        key='overview_map',
+        width=1200,
+        height=600,
+        center=map_center,
+        feature_group_to_add=restaurants,
+        returned_objects=['zoom', 'bounds', 'last_active_drawing', 'last_clicked']
+    )
 
-# Exibição do mapa no Streamlit
-st_folium(m, width=1200, height=600)
+if nearby is not None:
+    st.dataframe(nearby, use_container_width=True, hide_index=True)
 
+# Detalhes do restaurante clicado, buscados pelo Restaurant ID do ponto
+details = restaurant_details(get_index(store, build_restaurant_lookup), clicked_restaurant_id(map_value))
 
+if details is not None:
+    st.markdown(
+        f"**{details['Restaurant Name']}**  \n"
+        f"País: {details['Country Name']} | Cidade: {details['City']} | "
+        f"Culinária: {details['Cuisines']} | Nota média: {details['Aggregate rating']} ({details['Votes']} votos)"
+    )
+
+# =====================================
+# TEMPOS DA EXECUÇÃO
+# =====================================
+debug_panel(finish_trace(caches={'results': view_cache}))
@@ -1,106 +1,34 @@
-import pandas as pd
 import streamlit as st
 import plotly.express as px
-import folium
-from streamlit_folium import st_folium
-from IPython.display import display
 
-#------------------------------------------------------------------------------------------------------------
-# Base carregada
-
-df = pd.read_csv('dataset/zomato.csv')
+from utils.aggregates import build_country_aggregates
+from utils.assets import logo
+from utils.cache import build_figure_cache, build_view_cache, figure_key, selection_key
+from utils.data import get_aggregate_store, get_index
+from utils.facets import build_facet_index, facet_key, facet_sidebar, filtered_aggregates
+from utils.metrics import debug_panel, finish_trace, span, start_trace
+from utils.views import countries_view
 
 #------------------------------------------------------------------------------------------------------------
-# Funções
-
-COUNTRIES = {
-1: "India",
-14: "Australia",
-30: "Brazil",
-37: "Canada",
-94: "Indonesia",
-148: "New Zeland",
-162: "Philippines",
-166: "Qatar",
-184: "Singapure",
-189: "South Africa",
-191: "Sri Lanka",
-208: "Turkey",
-214: "United Arab Emirates",
-215: "England",
-216: "United States of America",
-}
-def country_name(country_id):
-    return COUNTRIES[country_id]
-
-def create_price_type(price_range):
-    if price_range == 1:
-        return "cheap"
-    elif price_range == 2:
-        return "normal"
-    elif price_range == 3:
-        return "expensive"
-    else:
-        return "gourmet"
-
-COLORS = {
-"3F7E00": "darkgreen",
-"5BA829": "green",
-"9ACD32": "lightgreen",
-"CDD614": "orange",
-"FFBA00": "red",
-"CBCBC8": "darkred",
-"FF7800": "darkred",
-}
-def color_name(color_code):
-    return COLORS[color_code]
-
-def filter_max(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_max = df_filter['Aggregate rating'].max()
-    
-    df_max_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_max].head(1)
-    
-    return df_max_restaurant
-
-def filter_min(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_min = df_filter['Aggregate rating'].min()
-    
-    df_min_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_min].head(1)
-    
-    return df_min_restaurant
+# Tempos desta execução da página, por etapa (ver utils/metrics.py)
+start_trace('Countries')
 
 #------------------------------------------------------------------------------------------------------------
-# Bloco limpeza e tratamento de dados
-
-# Início da limpeza, retirando possíveis espaços a mais nos campos object
-
-cols = df.select_dtypes(include=['object']).columns
-
-df[cols] = df[cols].select_dtypes(include=['object']).apply(lambda x: x.str.strip())
-
-# Redefinindo a base com a exclusão dos dados NaN na coluna Cuisine. Métodos de imputação foram testados porém não foram efetivos
-
-df = df[df['Cuisines'].notna()]
+# Versão da base usada por todo o rerun. A página não usa as linhas da base, então arquivos grandes são
+# agregados em streaming, sem as linhas em memória (df=None, ver utils/data.py)
+store = get_aggregate_store()
 
-# Eliminar linhas duplicadas
+# Agregados parciais por país, combinados a cada mudança do filtro (ver utils/aggregates.py)
+aggregates = get_index(store, build_country_aggregates)
 
-df = df.drop_duplicates()
+# Resultados por seleção de países, compartilhados entre reruns e sessões (ver utils/cache.py)
+view_cache = get_index(store, build_view_cache)
 
-df['Country Name'] = df['Country Code'].apply(lambda x: country_name(x))
-df['Price Type'] = df['Price range'].apply(lambda x: create_price_type(x))
-df['Color Name'] = df['Rating color'].apply(lambda x: color_name(x))
-df['Cuisines Unique'] = df.loc[:, "Cuisines"].apply(lambda x: x.split(",")[0])
-
-
-# Correção nome dos países que estavam incorretos
-
-df['Country Name'] = df['Country Name'].str.replace('Singapure','Singapore')
-df['Country Name'] = df['Country Name'].str.replace('New Zeland','New Zealand')
+# Figuras prontas por resultado da página e gráfico (ver utils/cache.py)
+figure_cache = get_index(store, build_figure_cache)
 
+# Bitmaps dos filtros adicionais da sidebar (None no modo streaming, ver utils/facets.py)
+facet_index = get_index(store, build_facet_index)
 
 # =====================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -120,18 +48,28 @@ st.set_page_config(
 # SIDEBAR (MESMA ESTRUTURA DA PÁGINA ANTERIOR)
 # =====================================
 with st.sidebar:
-    st.image('logo.png', use_container_width=True)
+    st.image(logo(), use_container_width=True)
     st.markdown('---')
 
-    countries = sorted(df['Country Name'].unique())
+    countries = list(aggregates.countries.index)
     selected_countries = st.multiselect(
         'Countries:',
         options=countries,
         default=countries
     )
 
-# Aplica filtro
-filtered_df = df[df['Country Name'].isin(selected_countries)]
+    # Filtros adicionais: os agregados passam a considerar só as linhas filtradas
+    facets = facet_sidebar(facet_index)
+    aggregates = filtered_aggregates(store.df, aggregates, facet_index, facets, view_cache)
+
+# Aplica filtro (indicadores por país dos países selecionados, ver utils/views.py)
+view_key = selection_key('countries', selected_countries, facet_key(facets))
+
+with span('view'):
+    view = view_cache.get_or_compute(
+        view_key,
+        lambda: countries_view(aggregates, selected_countries)
+    )
 
 # =====================================
 # TÍTULO
@@ -141,84 +79,87 @@ st.title('🌍 Countries View')
 # =====================================
 # GRÁFICO 1 – RESTAURANTES POR PAÍS
 # =====================================
-df_register_country = (
-    filtered_df.groupby('Country Name')['Restaurant ID']
-    .nunique()
-    .reset_index()
-    .sort_values(by='Restaurant ID', ascending=False)
-)
+df_register_country = view['df_register_country']
 
-fig1 = px.bar(
-    df_register_country,
-    x='Country Name',
-    y='Restaurant ID',
-    title='Number of Registered Restaurants by Country'
-)
+def build_fig1():
+    fig1 = px.bar(
+        df_register_country,
+        x='Country Name',
+        y='Restaurant ID',
+        title='Number of Registered Restaurants by Country'
+    )
 
-fig1.update_traces(marker_color='#4C78A8')
-fig1.update_layout(
-    xaxis_title='Country',
-    yaxis_title='Restaurants',
-    xaxis_tickangle=-45,
-    margin=dict(l=110, r=40, t=60, b=120),
-    height=500
-)
+    fig1.update_traces(marker_color='#4C78A8')
+    fig1.update_layout(
+        xaxis_title='Country',
+        yaxis_title='Restaurants',
+        xaxis_tickangle=-45,
+        margin=dict(l=110, r=40, t=60, b=120),
+        height=500
+    )
+
+    return fig1
+
+with span('figures'):
+    fig1 = figure_cache.get_or_compute(figure_key(view_key, 'fig1'), build_fig1)
 
 st.plotly_chart(fig1, use_container_width=True)
 
 # =====================================
 # GRÁFICO 2 – CIDADES POR PAÍS
 # =====================================
-df_register_city = (
-    filtered_df.groupby('Country Name')['City']
-    .nunique()
-    .reset_index()
-    .sort_values(by='City', ascending=False)
-)
+df_register_city = view['df_register_city']
 
-fig2 = px.bar(
-    df_register_city,
-    x='Country Name',
-    y='City',
-    title='Number of Registered Cities by Country'
-)
+def build_fig2():
+    fig2 = px.bar(
+        df_register_city,
+        x='Country Name',
+        y='City',
+        title='Number of Registered Cities by Country'
+    )
 
-fig2.update_traces(marker_color='#4C78A8')
-fig2.update_layout(
-    xaxis_title='Country',
-    yaxis_title='Number of Cities',
-    xaxis_tickangle=-45,
-    margin=dict(l=110, r=40, t=60, b=120),
-    height=500
-)
+    fig2.update_traces(marker_color='#4C78A8')
+    fig2.update_layout(
+        xaxis_title='Country',
+        yaxis_title='Number of Cities',
+        xaxis_tickangle=-45,
+        margin=dict(l=110, r=40, t=60, b=120),
+        height=500
+    )
+
+    return fig2
+
+with span('figures'):
+    fig2 = figure_cache.get_or_compute(figure_key(view_key, 'fig2'), build_fig2)
 
 st.plotly_chart(fig2, use_container_width=True)
 
 # =====================================
 # GRÁFICO 3 – MÉDIA DE AVALIAÇÕES
 # =====================================
-mean_country = (
-    filtered_df.groupby('Country Name')['Votes']
-    .mean()
-    .reset_index(name='Mean Votes')
-    .sort_values(by='Mean Votes', ascending=False)
-)
+mean_country = view['mean_country']
 
-fig3 = px.bar(
-    mean_country,
-    x='Country Name',
-    y='Mean Votes',
-    title='Rating Average by Country'
-)
+def build_fig3():
+    fig3 = px.bar(
+        mean_country,
+        x='Country Name',
+        y='Mean Votes',
+        title='Rating Average by Country'
+    )
 
-fig3.update_traces(marker_color='#4C78A8')
-fig3.update_layout(
-    xaxis_title='Country',
-    yaxis_title='Rating Average',
-    xaxis_tickangle=-45,
-    margin=dict(l=110, r=40, t=60, b=120),
-    height=500
-)
+    fig3.update_traces(marker_color='#4C78A8')
+    fig3.update_layout(
+        xaxis_title='Country',
+        yaxis_title='Rating Average',
+        xaxis_tickangle=-45,
+        margin=dict(l=110, r=40, t=60, b=120),
+        height=500
+    )
+
+    return fig3
+
+with span('figures'):
+    fig3 = figure_cache.get_or_compute(figure_key(view_key, 'fig3'), build_fig3)
 
 st.plotly_chart(fig3, use_container_width=True)
 
@@ -227,66 +168,38 @@ st.plotly_chart(fig3, use_container_width=True)
 # =====================================
 st.markdown('## Average Price for Two People by Country')
 
-plate_avg = (
-    filtered_df.groupby('Country Name')['Average Cost for two']
-    .mean()
-    .round(2)
-    .reset_index()
-)
-
-# -------- Linha 1 (países com escala semelhante)
-plate_avg_others = plate_avg[(plate_avg['Country Name'] != 'Indonesia') &
-                             (plate_avg['Country Name'] != 'Australia') &
-                             (plate_avg['Country Name'] != 'Sri Lanka') &
-                             (plate_avg['Country Name'] != 'Philippines') &
-                             (plate_avg['Country Name'] != 'India')]
-
-fig4 = px.bar(
-    plate_avg_others,
-    x='Country Name',
-    y='Average Cost for two',
-    title='Average Price (Comparable Scale)'
-)
-
-fig4.update_traces(marker_color='#4C78A8')
-fig4.update_layout(height=500)
-
-st.plotly_chart(fig4, use_container_width=True)
-
-# -------- Linha 2 (dois gráficos lado a lado)
-col1, col2 = st.columns(2)
-
-plate_avg_auind = plate_avg[(plate_avg['Country Name'] == 'Indonesia') |
-                            (plate_avg['Country Name'] == 'Australia')]
+plate_avg = view['plate_avg']
 
-fig5 = px.bar(
-    plate_avg_auind,
-    x='Country Name',
-    y='Average Cost for two',
-    title='Austrália, Indonésia'
-)
-fig5.update_traces(marker_color='#4C78A8')
+def build_fig4():
+    fig4 = px.bar(
+        plate_avg,
+        x='Country Name',
+        y='Average Cost for two (USD)',
+        title='Average Price for Two People (US$)'
+    )
 
-with col1:
-    st.plotly_chart(fig5, use_container_width=True)
+    fig4.update_traces(marker_color='#4C78A8')
+    fig4.update_layout(
+        xaxis_title='Country',
+        yaxis_title='Average Price (US$)',
+        xaxis_tickangle=-45,
+        margin=dict(l=110, r=40, t=60, b=120),
+        height=500
+    )
 
-plate_avg_pis = plate_avg[(plate_avg['Country Name'] == 'Philippines') |
-                           (plate_avg['Country Name'] == 'India') |
-                           (plate_avg['Country Name'] == 'Sri Lanka')]
+    return fig4
 
-fig6 = px.bar(
-    plate_avg_pis,
-    x='Country Name',
-    y='Average Cost for two',
-    title='Filipinas, Índia, Sri Lanka'
-)
-fig6.update_traces(marker_color='#4C78A8')
+with span('figures'):
+    fig4 = figure_cache.get_or_compute(figure_key(view_key, 'fig4'), build_fig4)
 
-with col2:
-    st.plotly_chart(fig6, use_container_width=True)
+st.plotly_chart(fig4, use_container_width=True)
 
 # Observação
 st.markdown(
-    '> **Note:** Multiple charts were created for this view because the values are expressed in each country’s local currency. Displaying all of them in a single chart would result in significant scale distortion.'
+    '> **Note:** Prices are converted from each country’s local currency to US dollars using the rate table in `dataset/currency_rates.csv`.'
 )
 
+# =====================================
+# TEMPOS DA EXECUÇÃO
+# =====================================
+debug_panel(finish_trace(caches={'results': view_cache, 'figures': figure_cache}))
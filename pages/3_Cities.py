@@ -1,109 +1,34 @@
-import pandas as pd
 import streamlit as st
 import plotly.express as px
-import folium
-from streamlit_folium import st_folium
-from IPython.display import display
 
-#------------------------------------------------------------------------------------------------------------
-# Base carregada
-
-df = pd.read_csv('dataset/zomato.csv')
+from utils.aggregates import build_country_aggregates
+from utils.assets import logo
+from utils.cache import build_figure_cache, build_view_cache, figure_key, selection_key
+from utils.data import get_aggregate_store, get_index
+from utils.facets import build_facet_index, facet_key, facet_sidebar, filtered_aggregates
+from utils.metrics import debug_panel, finish_trace, span, start_trace
+from utils.views import cities_view
 
 #------------------------------------------------------------------------------------------------------------
-# Funções
-
-COUNTRIES = {
-1: "India",
-14: "Australia",
-30: "Brazil",
-37: "Canada",
-94: "Indonesia",
-148: "New Zeland",
-162: "Philippines",
-166: "Qatar",
-184: "Singapure",
-189: "South Africa",
-191: "Sri Lanka",
-208: "Turkey",
-214: "United Arab Emirates",
-215: "England",
-216: "United States of America",
-}
-def country_name(country_id):
-    return COUNTRIES[country_id]
-
-def create_price_type(price_range):
-    if price_range == 1:
-        return "cheap"
-    elif price_range == 2:
-        return "normal"
-    elif price_range == 3:
-        return "expensive"
-    else:
-        return "gourmet"
-
-COLORS = {
-"3F7E00": "darkgreen",
-"5BA829": "green",
-"9ACD32": "lightgreen",
-"CDD614": "orange",
-"FFBA00": "red",
-"CBCBC8": "darkred",
-"FF7800": "darkred",
-}
-def color_name(color_code):
-    return COLORS[color_code]
-
-def filter_max(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_max = df_filter['Aggregate rating'].max()
-    
-    df_max_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_max].head(1)
-    
-    return df_max_restaurant
-
-def filter_min(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_min = df_filter['Aggregate rating'].min()
-    
-    df_min_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_min].head(1)
-    
-    return df_min_restaurant
+# Tempos desta execução da página, por etapa (ver utils/metrics.py)
+start_trace('Cities')
 
 #------------------------------------------------------------------------------------------------------------
-# Bloco limpeza e tratamento de dados
-
-# Início da limpeza, retirando possíveis espaços a mais nos campos object
-
-cols = df.select_dtypes(include=['object']).columns
-
-df[cols] = df[cols].select_dtypes(include=['object']).apply(lambda x: x.str.strip())
-
-# Redefinindo a base com a exclusão dos dados NaN na coluna Cuisine. Métodos de imputação foram testados porém não foram efetivos
-
-df = df[df['Cuisines'].notna()]
-
-# Eliminar linhas duplicadas
-
-df = df.drop_duplicates()
-
-df['Country Name'] = df['Country Code'].apply(lambda x: country_name(x))
-df['Price Type'] = df['Price range'].apply(lambda x: create_price_type(x))
-df['Color Name'] = df['Rating color'].apply(lambda x: color_name(x))
-df['Cuisines Unique'] = df.loc[:, "Cuisines"].apply(lambda x: x.split(",")[0])
-
-
-# Correção nome dos países que estavam incorretos
-
-df['Country Name'] = df['Country Name'].str.replace('Singapure','Singapore')
-df['Country Name'] = df['Country Name'].str.replace('New Zeland','New Zealand')
+# Versão da base usada por todo o rerun. A página não usa as linhas da base, então arquivos grandes são
+# agregados em streaming, sem as linhas em memória (df=None, ver utils/data.py)
+store = get_aggregate_store()
 
+# Agregados parciais por país, combinados a cada mudança do filtro (ver utils/aggregates.py)
+aggregates = get_index(store, build_country_aggregates)
 
+# Resultados por seleção de países, compartilhados entre reruns e sessões (ver utils/cache.py)
+view_cache = get_index(store, build_view_cache)
 
+# Figuras prontas por resultado da página e gráfico (ver utils/cache.py)
+figure_cache = get_index(store, build_figure_cache)
 
+# Bitmaps dos filtros adicionais da sidebar (None no modo streaming, ver utils/facets.py)
+facet_index = get_index(store, build_facet_index)
 
 # =====================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -123,18 +48,39 @@ st.set_page_config(
 # SIDEBAR (MESMA ESTRUTURA DAS PÁGINAS ANTERIORES)
 # =====================================
 with st.sidebar:
-    st.image('logo.png', use_container_width=True)
+    st.image(logo(), use_container_width=True)
     st.markdown('---')
 
-    countries = sorted(df['Country Name'].unique())
+    countries = list(aggregates.countries.index)
     selected_countries = st.multiselect(
         'Countries:',
         options=countries,
         default=countries
     )
 
-# Aplica filtro
-filtered_df = df[df['Country Name'].isin(selected_countries)]
+    # Filtros adicionais: os agregados passam a considerar só as linhas filtradas
+    facets = facet_sidebar(facet_index)
+    aggregates = filtered_aggregates(store.df, aggregates, facet_index, facets, view_cache)
+
+    # Culinária do gráfico de cidades por culinária (qualquer culinária listada, não só a primeira)
+    cuisines = aggregates.cuisine_names(selected_countries)
+    selected_cuisine = st.selectbox(
+        'Cuisine:',
+        options=cuisines,
+        index=cuisines.index('Italian') if 'Italian' in cuisines else 0
+    )
+
+# Consultas da página a partir dos indicadores por cidade dos países selecionados (ver utils/views.py). Só o
+# resultado vai para o cache: as estatísticas das consultas valem para a execução que as calculou
+view_key = selection_key('cities', selected_countries, selected_cuisine, facet_key(facets))
+
+with span('view'):
+    view = view_cache.get(view_key)
+    query_stats = None
+
+    if view is None:
+        view, query_stats = cities_view(aggregates, selected_countries, selected_cuisine)
+        view_cache.put(view_key, view)
 
 # =====================================
 # TÍTULO
@@ -144,24 +90,24 @@ st.title('🏙️ Cities View')
 # =====================================
 # BLOCO 1 – TOP 10 CIDADES COM MAIS RESTAURANTES
 # =====================================
-df_rest_country = (
-    filtered_df.groupby(['City', 'Country Name'])['Aggregate rating']
-    .count()
-    .reset_index()
-    .sort_values(by='Aggregate rating', ascending=False)
-    .head(10)
-)
+df_rest_country = view['df_rest_country']
+
+def build_fig_c():
+    fig_c = px.bar(
+        df_rest_country,
+        x='City',
+        y='Aggregate rating',
+        color='Country Name',
+        title='Top 10 cities with the highest number of restaurants in the dataset',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
 
-fig_c = px.bar(
-    df_rest_country,
-    x='City',
-    y='Aggregate rating',
-    color='Country Name',
-    title='Top 10 cities with the highest number of restaurants in the dataset',
-    color_discrete_sequence=px.colors.qualitative.Prism
-)
+    fig_c.update_layout(height=500)
+
+    return fig_c
 
-fig_c.update_layout(height=500)
+with span('figures'):
+    fig_c = figure_cache.get_or_compute(figure_key(view_key, 'fig_c'), build_fig_c)
 
 st.plotly_chart(fig_c, use_container_width=True)
 
@@ -174,63 +120,49 @@ col1, col2 = st.columns(2)
 
 # -------- Gráfico 1: Média > 4
 
-df_agg = (
-    filtered_df.groupby(['City', 'Country Name', 'Restaurant Name'])['Aggregate rating']
-    .mean()
-    .reset_index()
-)
+df_agg_fil = view['df_agg_fil']
+
+def build_fig_agg():
+    fig_agg = px.bar(
+        df_agg_fil,
+        x='City',
+        y='Aggregate rating',
+        color='Country Name',
+        title='Top 7 cities with restaurants having an average rating above 4',
+        color_discrete_sequence=px.colors.qualitative.Prism,
+        category_orders={'City': df_agg_fil['City'].tolist()}
+    )
 
-df_agg_fil = (
-    df_agg[df_agg['Aggregate rating'] > 4]
-    .groupby(['City', 'Country Name'])['Aggregate rating']
-    .count()
-    .reset_index()
-    .sort_values(by='Aggregate rating', ascending=False)
-    .head(7)
-)
+    fig_agg.update_layout(height=450)
 
-fig_agg = px.bar(
-    df_agg_fil,
-    x='City',
-    y='Aggregate rating',
-    color='Country Name',
-    title='Top 7 cities with restaurants having an average rating above 4',
-    color_discrete_sequence=px.colors.qualitative.Prism,
-    category_orders={'City': df_agg_fil['City'].tolist()}
-)
+    return fig_agg
 
-fig_agg.update_layout(height=450)
+with span('figures'):
+    fig_agg = figure_cache.get_or_compute(figure_key(view_key, 'fig_agg'), build_fig_agg)
 
 with col1:
     st.plotly_chart(fig_agg, use_container_width=True)
 
 # -------- Gráfico 2: Média < 2.5
 
-df_agg2 = (
-    filtered_df.groupby(['City', 'Country Name', 'Restaurant Name'])['Aggregate rating']
-    .mean()
-    .reset_index()
-)
+df_agg_fil2 = view['df_agg_fil2']
 
-df_agg_fil2 = (
-    df_agg2[df_agg2['Aggregate rating'] < 2.5]
-    .groupby(['City', 'Country Name'])['Aggregate rating']
-    .count()
-    .reset_index()
-    .sort_values(by='Aggregate rating', ascending=False)
-    .head(7)
-)
+def build_fig_agg2():
+    fig_agg2 = px.bar(
+        df_agg_fil2,
+        x='City',
+        y='Aggregate rating',
+        color='Country Name',
+        title='Top 7 cities with restaurants having an average rating below 2.5',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
 
-fig_agg2 = px.bar(
-    df_agg_fil2,
-    x='City',
-    y='Aggregate rating',
-    color='Country Name',
-    title='Top 7 cities with restaurants having an average rating below 2.5',
-    color_discrete_sequence=px.colors.qualitative.Prism
-)
+    fig_agg2.update_layout(height=450)
 
-fig_agg2.update_layout(height=450)
+    return fig_agg2
+
+with span('figures'):
+    fig_agg2 = figure_cache.get_or_compute(figure_key(view_key, 'fig_agg2'), build_fig_agg2)
 
 with col2:
     st.plotly_chart(fig_agg2, use_container_width=True)
@@ -240,23 +172,63 @@ st.markdown('---')
 # =====================================
 # BLOCO 3 – TIPOS CULINÁRIOS DISTINTOS
 # =====================================
-df_agg_unique = (
-    filtered_df.groupby(['City', 'Country Name'])['Cuisines Unique']
-    .nunique()
-    .reset_index()
-    .sort_values(by='Cuisines Unique', ascending=False)
-    .head(10)
-)
+df_agg_unique = view['df_agg_unique']
+
+def build_fig_agg_unique():
+    fig_agg_unique = px.bar(
+        df_agg_unique,
+        x='City',
+        y='Cuisines Unique',
+        color='Country Name',
+        title='Top 10 cities with the highest number of restaurants offering distinct cuisine types',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
 
-fig_agg_unique = px.bar(
-    df_agg_unique,
-    x='City',
-    y='Cuisines Unique',
-    color='Country Name',
-    title='Top 10 cities with the highest number of restaurants offering distinct cuisine types',
-    color_discrete_sequence=px.colors.qualitative.Prism
-)
+    fig_agg_unique.update_layout(height=500)
+
+    return fig_agg_unique
 
-fig_agg_unique.update_layout(height=500)
+with span('figures'):
+    fig_agg_unique = figure_cache.get_or_compute(figure_key(view_key, 'fig_agg_unique'), build_fig_agg_unique)
 
 st.plotly_chart(fig_agg_unique, use_container_width=True)
+
+st.markdown('---')
+
+# =====================================
+# BLOCO 4 – CIDADES POR CULINÁRIA
+# =====================================
+df_cuisine_cities = view['df_cuisine_cities']
+
+def build_fig_cuisine_cities():
+    fig_cuisine_cities = px.bar(
+        df_cuisine_cities,
+        x='City',
+        y='Restaurants',
+        color='Country Name',
+        title=f'Top 10 cities with the most restaurants offering {selected_cuisine} cuisine',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
+
+    fig_cuisine_cities.update_layout(height=500)
+
+    return fig_cuisine_cities
+
+with span('figures'):
+    fig_cuisine_cities = figure_cache.get_or_compute(figure_key(view_key, 'fig_cuisine_cities'), build_fig_cuisine_cities)
+
+st.plotly_chart(fig_cuisine_cities, use_container_width=True)
+
+# =====================================
+# DETALHES DAS CONSULTAS
+# =====================================
+with st.expander('Query details'):
+    if query_stats is None:
+        st.markdown('Results served from the cache: no queries ran in this rerun.')
+    else:
+        st.dataframe(query_stats, use_container_width=True, hide_index=True)
+
+# =====================================
+# TEMPOS DA EXECUÇÃO
+# =====================================
+debug_panel(finish_trace(caches={'results': view_cache, 'figures': figure_cache}))
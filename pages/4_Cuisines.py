@@ -1,113 +1,34 @@
-import pandas as pd
 import streamlit as st
 import plotly.express as px
-import folium
-from streamlit_folium import st_folium
-from IPython.display import display
 
-#------------------------------------------------------------------------------------------------------------
-# Base carregada
-
-df = pd.read_csv('dataset/zomato.csv')
+from utils.aggregates import build_country_aggregates
+from utils.assets import logo
+from utils.cache import build_figure_cache, build_view_cache, figure_key, selection_key
+from utils.data import get_aggregate_store, get_index
+from utils.facets import build_facet_index, facet_key, facet_sidebar, filtered_aggregates
+from utils.metrics import debug_panel, finish_trace, span, start_trace
+from utils.views import cuisines_view, filter_kpi
 
 #------------------------------------------------------------------------------------------------------------
-# Funções
-
-COUNTRIES = {
-1: "India",
-14: "Australia",
-30: "Brazil",
-37: "Canada",
-94: "Indonesia",
-148: "New Zeland",
-162: "Philippines",
-166: "Qatar",
-184: "Singapure",
-189: "South Africa",
-191: "Sri Lanka",
-208: "Turkey",
-214: "United Arab Emirates",
-215: "England",
-216: "United States of America",
-}
-def country_name(country_id):
-    return COUNTRIES[country_id]
-
-def create_price_type(price_range):
-    if price_range == 1:
-        return "cheap"
-    elif price_range == 2:
-        return "normal"
-    elif price_range == 3:
-        return "expensive"
-    else:
-        return "gourmet"
-
-COLORS = {
-"3F7E00": "darkgreen",
-"5BA829": "green",
-"9ACD32": "lightgreen",
-"CDD614": "orange",
-"FFBA00": "red",
-"CBCBC8": "darkred",
-"FF7800": "darkred",
-}
-def color_name(color_code):
-    return COLORS[color_code]
-
-def filter_max(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_max = df_filter['Aggregate rating'].max()
-    
-    df_max_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_max].head(1)
-    
-    return df_max_restaurant
-
-def filter_min(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-    
-    df_filter_min = df_filter['Aggregate rating'].min()
-    
-    df_min_restaurant = df_filter[['Restaurant Name']][df_filter['Aggregate rating'] == df_filter_min].head(1)
-    
-    return df_min_restaurant
-
-##Função filtro KPI
-def filter_kpi(Cuisine):
-    df_filter = df[df['Cuisines Unique'] == Cuisine].groupby('Restaurant Name')['Aggregate rating'].mean().reset_index().sort_values(by='Aggregate rating', ascending=False)
-        
-    df_filter['Aggregate rating'].max()
-    return df_filter[['Restaurant Name', 'Aggregate rating']][df_filter['Aggregate rating'] == df_filter_max].head(1).T
-
-    
-#------------------------------------------------------------------------------------------------------------
-# Bloco limpeza e tratamento de dados
-
-# Início da limpeza, retirando possíveis espaços a mais nos campos object
-
-cols = df.select_dtypes(include=['object']).columns
-
-df[cols] = df[cols].select_dtypes(include=['object']).apply(lambda x: x.str.strip())
+# Tempos desta execução da página, por etapa (ver utils/metrics.py)
+start_trace('Cuisines')
 
-# Redefinindo a base com a exclusão dos dados NaN na coluna Cuisine. Métodos de imputação foram testados porém não foram efetivos
-
-df = df[df['Cuisines'].notna()]
-
-# Eliminar linhas duplicadas
-
-df = df.drop_duplicates()
+#------------------------------------------------------------------------------------------------------------
+# Versão da base usada por todo o rerun. A página não usa as linhas da base, então arquivos grandes são
+# agregados em streaming, sem as linhas em memória (df=None, ver utils/data.py)
+store = get_aggregate_store()
 
-df['Country Name'] = df['Country Code'].apply(lambda x: country_name(x))
-df['Price Type'] = df['Price range'].apply(lambda x: create_price_type(x))
-df['Color Name'] = df['Rating color'].apply(lambda x: color_name(x))
-df['Cuisines Unique'] = df.loc[:, "Cuisines"].apply(lambda x: x.split(",")[0])
+# Agregados parciais por país, combinados a cada mudança do filtro (ver utils/aggregates.py)
+aggregates = get_index(store, build_country_aggregates)
 
+# Resultados por seleção de países, compartilhados entre reruns e sessões (ver utils/cache.py)
+view_cache = get_index(store, build_view_cache)
 
-# Correção nome dos países que estavam incorretos
+# Figuras prontas por resultado da página e gráfico (ver utils/cache.py)
+figure_cache = get_index(store, build_figure_cache)
 
-df['Country Name'] = df['Country Name'].str.replace('Singapure','Singapore')
-df['Country Name'] = df['Country Name'].str.replace('New Zeland','New Zealand')
+# Bitmaps dos filtros adicionais da sidebar (None no modo streaming, ver utils/facets.py)
+facet_index = get_index(store, build_facet_index)
 
 # =====================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -127,39 +48,36 @@ st.set_page_config(
 # SIDEBAR (PADRÃO DAS PÁGINAS ANTERIORES)
 # =====================================
 with st.sidebar:
-    st.image('logo.png', use_container_width=True)
+    st.image(logo(), use_container_width=True)
     st.markdown('---')
 
-    countries = sorted(df['Country Name'].unique())
+    countries = list(aggregates.countries.index)
     selected_countries = st.multiselect(
         'Countries:',
         options=countries,
         default=countries
     )
 
-# Aplica filtro
-filtered_df = df[df['Country Name'].isin(selected_countries)]
+    # Filtros adicionais: os agregados passam a considerar só as linhas filtradas
+    facets = facet_sidebar(facet_index)
+    aggregates = filtered_aggregates(store.df, aggregates, facet_index, facets, view_cache)
 
-# =====================================
-# FUNÇÃO KPI – MELHOR RESTAURANTE POR TIPO
-# =====================================
-def filter_kpi(cuisine):
-    aux = filtered_df[filtered_df['Cuisines Unique'] == cuisine]
-
-    aux = aux.sort_values(
-        by=['Aggregate rating', 'Votes'],
-        ascending=False
+    # Conta cada restaurante em todas as culinárias listadas (KPIs, melhor/pior e notas por culinária)
+    listed_cuisines = st.checkbox(
+        'Count every listed cuisine',
+        value=False,
+        help='Applies to the cuisine KPIs, the best/worst table and the ratings charts. '
+             'The Top 10 ranks restaurants regardless of cuisine.'
     )
 
-    if aux.empty:
-        return {'Restaurant': 'N/A', 'Rating': 'N/A'}
-
-    top = aux.iloc[0]
+# Aplica filtro (KPIs, Top 10 e notas por culinária dos países selecionados, ver utils/views.py)
+view_key = selection_key('cuisines', selected_countries, listed_cuisines, facet_key(facets))
 
-    return {
-        'Restaurant': top['Restaurant Name'],
-        'Rating': top['Aggregate rating']
-    }
+with span('view'):
+    view = view_cache.get_or_compute(
+        view_key,
+        lambda: cuisines_view(aggregates, selected_countries, listed_cuisines)
+    )
 
 # =====================================
 # TÍTULO
@@ -171,11 +89,11 @@ st.title('🍽️ Cuisines View')
 # =====================================
 st.markdown('## Best Restaurants among the Main Cuisine Types')
 
-kpi_italian = filter_kpi('Italian')
-kpi_american = filter_kpi('American')
-kpi_japanese = filter_kpi('Japanese')
-kpi_indian = filter_kpi('Indian')
-kpi_chinese = filter_kpi('Chinese')
+kpi_italian = view['kpis']['Italian']
+kpi_american = view['kpis']['American']
+kpi_japanese = view['kpis']['Japanese']
+kpi_indian = view['kpis']['Indian']
+kpi_chinese = view['kpis']['Chinese']
 
 col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -196,18 +114,37 @@ with col5:
 
 st.markdown('---')
 
+# =====================================
+# BLOCO 1.1 – MELHOR E PIOR POR TIPO (QUALQUER CULINÁRIA)
+# =====================================
+st.markdown('## Best and Worst Restaurant by Cuisine Type')
+
+leaderboard = view['leaderboard']
+
+selected_cuisine = st.selectbox('Cuisine:', options=list(leaderboard.index))
+
+kpi_best = filter_kpi(leaderboard, selected_cuisine, 'Best')
+kpi_worst = filter_kpi(leaderboard, selected_cuisine, 'Worst')
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.metric('Best', kpi_best['Restaurant'], kpi_best['Rating'])
+
+with col2:
+    st.metric('Worst', kpi_worst['Restaurant'], kpi_worst['Rating'])
+
+with st.expander('All cuisine types'):
+    st.dataframe(leaderboard, use_container_width=True)
+
+st.markdown('---')
+
 # =====================================
 # BLOCO 2 – TOP 10 RESTAURANTES
 # =====================================
 st.markdown('## Top 10 Restaurants')
 
-df_top10 = (
-    filtered_df[['Restaurant ID', 'Restaurant Name', 'Country Name', 'City',
-                 'Cuisines Unique', 'Average Cost for two',
-                 'Aggregate rating', 'Votes']]
-    .sort_values(by=['Aggregate rating', 'Votes'], ascending=False)
-    .head(10)
-)
+df_top10 = view['df_top10']
 
 st.dataframe(df_top10, use_container_width=True)
 
@@ -223,42 +160,46 @@ st.markdown('---')
 col1, col2 = st.columns(2)
 
 # -------- Melhores tipos
-best_cuisines = (
-    filtered_df.groupby('Cuisines Unique')['Aggregate rating']
-    .mean()
-    .reset_index()
-    .sort_values(by='Aggregate rating', ascending=False)
-    .head(10)
-)
+best_cuisines = view['best_cuisines']
+
+def build_fig_best():
+    fig_best = px.bar(
+        best_cuisines,
+        x='Cuisines Unique',
+        y='Aggregate rating',
+        title='Top 10 Best Cuisine Types',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
 
-fig_best = px.bar(
-    best_cuisines,
-    x='Cuisines Unique',
-    y='Aggregate rating',
-    title='Top 10 Best Cuisine Types',
-    color_discrete_sequence=px.colors.qualitative.Prism
-)
+    return fig_best
+
+with span('figures'):
+    fig_best = figure_cache.get_or_compute(figure_key(view_key, 'fig_best'), build_fig_best)
 
 with col1:
     st.plotly_chart(fig_best, use_container_width=True)
 
 # -------- Piores tipos
-bottom_cuisine = (
-    filtered_df[filtered_df['Cuisines Unique'] != 'Drinks Only']
-    .groupby('Cuisines Unique')['Aggregate rating']
-    .mean()
-    .reset_index()
-    .sort_values(by='Aggregate rating', ascending=True)
-    .head(10)
-)
+bottom_cuisine = view['bottom_cuisine']
+
+def build_fig_bottom():
+    fig_bottom = px.bar(
+        bottom_cuisine,
+        x='Cuisines Unique',
+        y='Aggregate rating',
+        title='Top 10 Most Unpopular Cuisines',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
 
-fig_bottom = px.bar(
-    bottom_cuisine,
-    x='Cuisines Unique',
-    y='Aggregate rating',
-    title='Top 10 Most Unpopular Cuisines',
-    color_discrete_sequence=px.colors.qualitative.Prism
-)
+    return fig_bottom
+
+with span('figures'):
+    fig_bottom = figure_cache.get_or_compute(figure_key(view_key, 'fig_bottom'), build_fig_bottom)
 
 with col2:
     st.plotly_chart(fig_bottom, use_container_width=True)
+
+# =====================================
+# TEMPOS DA EXECUÇÃO
+# =====================================
+debug_panel(finish_trace(caches={'results': view_cache, 'figures': figure_cache}))
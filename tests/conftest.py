@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import pytest
+
+from utils.data import DATA_PATH, load_data
+from utils.schema import compact
+
+#------------------------------------------------------------------------------------------------------------
+# Base de teste: o CSV do repositório, lido e tratado uma única vez por execução
+#
+# Os caminhos da base e da tabela de câmbio são relativos à raiz do repositório, como no dashboard. Rodar
+# da raiz do repositório:
+#
+#     python -m pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='session', autouse=True)
+def root_dir():
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(cwd)
+
+@pytest.fixture(scope='session')
+def raw(root_dir):
+    return pd.read_csv(DATA_PATH)
+
+# Base tratada com os tipos do CSV
+@pytest.fixture(scope='session')
+def df(root_dir):
+    return load_data()
+
+# Base no esquema compacto, como guardada pelo store
+@pytest.fixture(scope='session')
+def store_df(df):
+    return compact(df)
+
+@pytest.fixture(scope='session')
+def countries(df):
+    return sorted(df['Country Name'].unique())
+
+# Seleções da sidebar usadas nas comparações: todos os países, alguns e nenhum
+@pytest.fixture(scope='session')
+def selections(countries):
+    return [countries, ['India', 'Brazil', 'England'], ['United States of America'], []]
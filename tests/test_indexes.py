@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import search
+from utils.aggregates import CountryAggregates
+from utils.data import DATA_PATH
+from utils.facets import FacetIndex
+from utils.geo import haversine_km, nearest, within_radius
+from utils.maps import build_grid_index
+from utils.search import SEARCH_COLUMNS, SearchIndex, normalize
+from utils.streaming import stream_aggregates
+
+#------------------------------------------------------------------------------------------------------------
+# Estruturas incrementais: o mesmo resultado construindo de uma vez ou lote a lote (add_rows)
+
+BATCH_SIZES = [1, 250, 1000, 2500]
+
+def batches(df, sizes=BATCH_SIZES):
+    start = 0
+    for size in sizes:
+        yield df.iloc[start:start + size]
+        start += size
+
+    yield df.iloc[start:]
+
+# Tudo o que as páginas consultam nos agregados para uma seleção de países
+def aggregate_outputs(aggregates, selected):
+    return {
+        'kpis': aggregates.overview_kpis(selected),
+        'map_center': aggregates.map_center(selected),
+        'country_stats': aggregates.country_stats(selected),
+        'city_stats': aggregates.city_stats(selected),
+        'cuisine_ratings': aggregates.cuisine_ratings(selected),
+        'listed_ratings': aggregates.cuisine_ratings(selected, listed=True),
+        'cuisine_names': aggregates.cuisine_names(selected),
+        'cuisine_cities': aggregates.cuisine_cities(selected, 'Italian'),
+        'top': aggregates.top_restaurants(selected),
+        'leaderboard': aggregates.cuisine_leaderboard(selected),
+        'listed_leaderboard': aggregates.cuisine_leaderboard(selected, listed=True),
+    }
+
+def assert_same_outputs(result, expected):
+    assert result.keys() == expected.keys()
+
+    for name, value in expected.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(result[name], value, check_dtype=False, check_index_type=False,
+                                          check_categorical=False, obj=name)
+        elif isinstance(value, pd.Series):
+            pd.testing.assert_series_equal(result[name], value, check_dtype=False, check_index_type=False,
+                                           check_categorical=False, obj=name)
+        else:
+            assert result[name] == pytest.approx(value), name
+
+def test_aggregates_incremental_matches_full_build(store_df, selections):
+    full = CountryAggregates(store_df)
+
+    incremental = CountryAggregates()
+    for rows in batches(store_df):
+        incremental.add_rows(rows)
+
+        # Leituras entre lotes compactam as tabelas e recalculam só as cidades afetadas
+        incremental.cities
+
+    assert incremental.rows == full.rows == len(store_df)
+    for selected in selections:
+        assert_same_outputs(aggregate_outputs(incremental, selected), aggregate_outputs(full, selected))
+
+def test_streaming_aggregates_match_full_build(store_df, selections):
+    full = CountryAggregates(store_df)
+    streamed = stream_aggregates(DATA_PATH, chunksize=1000)
+
+    for selected in selections:
+        expected = aggregate_outputs(full, selected)
+        result = aggregate_outputs(streamed, selected)
+
+        # O Top 10 do modo streaming não guarda o índice original das linhas
+        result['top'] = result['top'].reset_index(drop=True)
+        expected['top'] = expected['top'].reset_index(drop=True)
+
+        assert_same_outputs(result, expected)
+
+def test_facet_index_incremental_matches_full_build(store_df):
+    full = FacetIndex(store_df)
+
+    incremental = FacetIndex(store_df.iloc[:0])
+    for rows in batches(store_df):
+        incremental.add_rows(rows)
+
+    assert incremental.rows == full.rows
+    assert incremental.bitmaps == full.bitmaps
+
+def test_facet_mask_matches_isin(store_df, selections):
+    index = FacetIndex(store_df)
+    facets = [{}, {'City': ['New Delhi', 'London', 'Rio de Janeiro']}, {'Has Online delivery': [1], 'Price Type': ['cheap']}]
+
+    for selected in selections + [None]:
+        for facet in facets:
+            expected = np.ones(len(store_df), dtype='bool')
+            if selected is not None:
+                expected &= store_df['Country Name'].isin(selected).to_numpy()
+            for column, values in facet.items():
+                expected &= store_df[column].isin(values).to_numpy()
+
+            np.testing.assert_array_equal(index.mask(facet, selected), expected)
+
+#------------------------------------------------------------------------------------------------------------
+# Busca
+
+QUERIES = ['connaught place', 'burger', 'pizza hut', 'Barbeque Nation', 'starbuck', 'cafe coffe day',
+           'mcdonalds delhi', 'caf', 'cp', 'zzzqx', 'São Paulo']
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+# Trigramas do nome e do texto completo de cada linha
+@pytest.fixture(scope='module')
+def row_trigrams(store_df):
+    name = normalize(store_df[SEARCH_COLUMNS[0]])
+    text = name
+    for column in SEARCH_COLUMNS[1:]:
+        text = text + normalize(store_df[column])
+
+    return [(trigrams(row_name), trigrams(row_text)) for row_name, row_text in zip(name, text)]
+
+# Nota de cada linha calculada diretamente: fração dos trigramas das palavras da busca presentes no texto
+def brute_force_search(row_trigrams, query, limit, mask=None, min_score=search.FUZZY_MIN_SCORE):
+    words = normalize(pd.Series([query])).iloc[0].split()
+    codes = set().union(*(trigrams(' ' + word) for word in words)) if words else set()
+
+    if not codes:
+        return np.array([], dtype='int64'), np.array([], dtype='float64')
+
+    results = []
+    for position, (name, text) in enumerate(row_trigrams):
+        score = len(codes & text) / len(codes)
+        if score >= min_score and (mask is None or mask[position]):
+            results.append((-score, -len(codes & name), position))
+
+    results = sorted(results)[:limit]
+
+    return (np.array([position for _, _, position in results], dtype='int64'),
+            np.array([-score for score, _, _ in results], dtype='float64'))
+
+@pytest.fixture(scope='module')
+def search_index(store_df):
+    return SearchIndex(store_df)
+
+def test_search_matches_brute_force(store_df, search_index, row_trigrams):
+    mask = (store_df['Country Name'] == 'India').to_numpy()
+
+    for query in QUERIES:
+        for query_mask in [None, mask]:
+            for min_score in [0.6, 0.3, 1.0]:
+                positions, scores = search_index.search(query, limit=50, mask=query_mask, min_score=min_score)
+                expected_positions, expected_scores = brute_force_search(row_trigrams, query, 50, query_mask, min_score)
+
+                np.testing.assert_array_equal(positions, expected_positions, err_msg=query)
+                np.testing.assert_allclose(scores, expected_scores, err_msg=query)
+
+def test_search_incremental_matches_full_build(store_df, search_index, monkeypatch):
+    # Segmentos pequenos: cada lote vira vários segmentos, com posições relativas a cada um
+    monkeypatch.setattr(search, 'BUILD_CHUNK_SIZE', 700)
+
+    incremental = SearchIndex(store_df.iloc[:0])
+    for rows in batches(store_df):
+        incremental.add_rows(rows)
+
+    assert incremental.rows == search_index.rows
+    for query in QUERIES:
+        for result, expected in zip(incremental.search(query, limit=100), search_index.search(query, limit=100)):
+            np.testing.assert_array_equal(result, expected, err_msg=query)
+
+#------------------------------------------------------------------------------------------------------------
+# Consultas por distância: mesmo resultado que a distância calculada para todas as linhas
+
+@pytest.fixture(scope='module')
+def grid_index(store_df):
+    return build_grid_index(store_df)
+
+def query_points(store_df):
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(store_df), 20)
+    near = zip(store_df['Latitude'].iloc[rows] + rng.normal(0, 0.05, 20),
+               store_df['Longitude'].iloc[rows] + rng.normal(0, 0.05, 20))
+    anywhere = zip(rng.uniform(-89, 89, 10), rng.uniform(-180, 180, 10))
+
+    return [*near, *anywhere, (0.0, 179.9), (89.5, 0.0)]
+
+def brute_force_distances(index, lat, lon, mask=None):
+    distances = haversine_km(*index.coordinates(), lat, lon)
+    rows = np.arange(len(distances)) if mask is None else np.flatnonzero(mask)
+    order = np.lexsort((rows, distances[rows]))
+
+    return rows[order], distances[rows][order]
+
+def test_within_radius_matches_brute_force(store_df, grid_index):
+    mask = (store_df['Aggregate rating'] >= 4).to_numpy()
+
+    for lat, lon in query_points(store_df):
+        for radius_km in [0.5, 5, 50, 2000, 25000]:
+            for query_mask in [None, mask]:
+                rows, distances = within_radius(grid_index, lat, lon, radius_km, query_mask)
+                expected_rows, expected_distances = brute_force_distances(grid_index, lat, lon, query_mask)
+                inside = expected_distances <= radius_km
+
+                np.testing.assert_array_equal(rows, expected_rows[inside])
+                np.testing.assert_allclose(distances, expected_distances[inside])
+
+def test_nearest_matches_brute_force(store_df, grid_index):
+    mask = (store_df['Country Name'] == 'Brazil').to_numpy()
+
+    for lat, lon in query_points(store_df):
+        for n in [1, 10, 100]:
+            for query_mask in [None, mask]:
+                rows, distances = nearest(grid_index, lat, lon, n, query_mask)
+                expected_rows, expected_distances = brute_force_distances(grid_index, lat, lon, query_mask)
+
+                np.testing.assert_array_equal(rows, expected_rows[:n])
+                np.testing.assert_allclose(distances, expected_distances[:n])
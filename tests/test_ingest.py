@@ -0,0 +1,208 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.aggregates import CountryAggregates, build_country_aggregates
+from utils.data import CHUNK_SIZE, DATA_PATH, clean_data, drop_missing_cuisines, read_clean_chunks, strip_text_columns
+from utils.dedup import KEY_COLUMN, Deduplicator, fingerprint
+from utils.facets import build_facet_index
+from utils.ingest import RestaurantStore
+from utils.maps import build_grid_index
+from utils.schema import compact
+from utils.search import build_search_index
+from utils.snapshot import SNAPSHOT_VERSION, build_snapshot, load_snapshot, snapshot_version
+from tests.test_indexes import aggregate_outputs, assert_same_outputs
+
+#------------------------------------------------------------------------------------------------------------
+# Deduplicação pedaço a pedaço: mesmas linhas que um drop_duplicates com a base inteira em memória
+
+# Linhas que chegam à deduplicação (depois da limpeza de texto e dos NaN em Cuisines)
+@pytest.fixture(scope='module')
+def stripped(raw):
+    return drop_missing_cuisines(strip_text_columns(raw))
+
+@pytest.mark.parametrize('chunksize', [97, 1000, CHUNK_SIZE])
+def test_chunked_dedup_matches_drop_duplicates(stripped, chunksize):
+    dedup = Deduplicator()
+    df = pd.concat(read_clean_chunks(DATA_PATH, dedup, chunksize=chunksize))
+
+    expected = stripped.drop_duplicates(subset=KEY_COLUMN)
+    pd.testing.assert_index_equal(df.index, expected.index)
+
+    # Versões repetidas de um ID: idênticas à primeira (duplicatas) ou diferentes (conflitos)
+    repeated = stripped[KEY_COLUMN].duplicated().to_numpy()
+    first = pd.Series(fingerprint(stripped)).groupby(stripped[KEY_COLUMN].to_numpy()).transform('first').to_numpy()
+    same = fingerprint(stripped) == first
+
+    report = dedup.report()
+    assert report['duplicates'] == (repeated & same).sum()
+    assert report['conflicts'] == (repeated & ~same).sum()
+    assert len(stripped.drop_duplicates()) == len(df) + report['conflicts']
+
+def test_dedup_keeps_first_version_across_chunks(stripped):
+    rows = stripped.drop_duplicates(subset=KEY_COLUMN).iloc[:4]
+    conflicting = rows.iloc[[1]].assign(Votes=rows['Votes'].iloc[1] + 1)
+    frame = pd.concat([rows, rows.iloc[[0]], conflicting, rows.iloc[[2]]])
+
+    dedup = Deduplicator()
+    kept = pd.concat([dedup(frame.iloc[:3]), dedup(frame.iloc[3:5]), dedup(frame.iloc[5:])])
+
+    pd.testing.assert_frame_equal(kept, rows)
+    assert (dedup.report()['duplicates'], dedup.report()['conflicts']) == (2, 1)
+    assert dedup.conflict_versions()[KEY_COLUMN].tolist() == [rows[KEY_COLUMN].iloc[1]]
+
+#------------------------------------------------------------------------------------------------------------
+# Snapshot: a carga devolve a base compacta e registra os mesmos restaurantes na deduplicação
+
+def test_snapshot_roundtrip(df, store_df, stripped, tmp_path):
+    path = str(tmp_path / 'zomato.arrow')
+
+    assert build_snapshot(DATA_PATH, path) == len(df)
+    assert snapshot_version(path) == SNAPSHOT_VERSION
+
+    dedup = Deduplicator()
+    loaded = load_snapshot(path, dedup)
+
+    pd.testing.assert_frame_equal(loaded, store_df)
+    assert not os.path.exists(path + '.partial')
+
+    # Sem as linhas: todas já vistas, com as mesmas duplicatas e conflitos da carga do CSV
+    expected = Deduplicator().seed(df)
+    assert dedup(stripped).empty and expected(stripped).empty
+    assert dedup.report() == expected.report()
+
+def test_snapshot_version_of_other_files(tmp_path):
+    path = tmp_path / 'broken.arrow'
+    path.write_bytes(b'not arrow')
+
+    assert snapshot_version(str(path)) is None
+
+#------------------------------------------------------------------------------------------------------------
+# Ingestão incremental
+
+NEW_ROWS = 50
+
+@pytest.fixture
+def store(df):
+    store = RestaurantStore(df.iloc[:-NEW_ROWS].copy())
+    store.index(build_country_aggregates)
+
+    return store
+
+# Lote com os últimos restaurantes da base, no formato do CSV
+@pytest.fixture
+def batch(raw, df):
+    ids = df[KEY_COLUMN].iloc[-NEW_ROWS:]
+
+    return raw[raw[KEY_COLUMN].isin(ids)].drop_duplicates(subset=KEY_COLUMN)
+
+def test_append_matches_full_build(store, batch, store_df, countries):
+    summary = store.append(batch)
+
+    assert summary['status'] == 'ok'
+    assert summary['added'] == NEW_ROWS
+    # As linhas novas recebem índices seguintes aos da base, e as categorias novas do lote entram no fim
+    pd.testing.assert_frame_equal(store.df.reset_index(drop=True), store_df.reset_index(drop=True),
+                                  check_categorical=False)
+
+    aggregates = store.index(build_country_aggregates)
+    assert_same_outputs(aggregate_outputs(aggregates, countries), aggregate_outputs(CountryAggregates(store_df), countries))
+
+    # O mesmo lote de novo: só restaurantes já existentes, nada muda
+    version = store.version
+    assert store.append(batch)['added'] == 0
+    assert store.version == version
+
+@pytest.mark.parametrize('broken', [
+    lambda batch: batch.drop(columns='Rating color'),
+    lambda batch: batch.assign(**{'Country Code': 'unknown'}),
+])
+def test_failed_append_leaves_store_unchanged(store, batch, broken):
+    df, version, report = store.df, store.version, store.dedup.report()
+
+    with pytest.raises(ValueError):
+        store.append(broken(batch))
+
+    assert store.df is df and store.version == version
+    assert store.dedup.report() == report
+    assert not any(restaurant_id in store.dedup for restaurant_id in batch[KEY_COLUMN])
+
+    # O lote corrigido entra inteiro
+    assert store.append(batch)['added'] == NEW_ROWS
+
+# Data de modificação no passado: o arquivo já terminou de ser copiado
+def settle(path, seconds_ago=60):
+    mtime = time.time() - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+def test_ingest_incoming_records_failed_files(store, batch, tmp_path):
+    bad, good = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    batch.iloc[:10].drop(columns='Cuisines').to_csv(bad, index=False)
+    batch.iloc[10:].to_csv(good, index=False)
+    settle(bad)
+    settle(good)
+
+    results = store.ingest_incoming(str(tmp_path))
+
+    assert [result['status'] for result in results] == ['failed', 'ok']
+    assert 'Cuisines' in results[0]['error']
+    assert results[1]['added'] == NEW_ROWS - 10
+
+    # Arquivos já lidos (inclusive o falho, sem alteração) não são lidos de novo
+    assert store.ingest_incoming(str(tmp_path)) == []
+
+    # O arquivo falho é lido de novo quando muda
+    batch.iloc[:10].to_csv(bad, index=False)
+    settle(bad, 30)
+
+    results = store.ingest_incoming(str(tmp_path))
+    assert [(result['status'], result['added']) for result in results] == [('ok', 10)]
+    assert np.array_equal(np.sort(store.df[KEY_COLUMN].to_numpy()[-NEW_ROWS:]), np.sort(batch[KEY_COLUMN].to_numpy()))
+
+def test_ingest_incoming_rereads_files_completed_later(store, batch, df, tmp_path):
+    path = tmp_path / 'day.csv'
+    text = batch.to_csv(index=False)
+    lines = text.splitlines(keepends=True)
+
+    # Cópia interrompida no meio, numa quebra de linha: metade do lote entra
+    path.write_text(''.join(lines[:NEW_ROWS // 2 + 1]))
+    settle(path)
+    assert [result['added'] for result in store.ingest_incoming(str(tmp_path))] == [NEW_ROWS // 2]
+
+    # Recém-modificado: espera a próxima varredura
+    path.write_text(text)
+    assert store.ingest_incoming(str(tmp_path)) == []
+
+    # Completo: lido de novo, só a outra metade entra
+    settle(path, 30)
+    results = store.ingest_incoming(str(tmp_path))
+    assert [(result['added'], result['duplicates']) for result in results] == [(NEW_ROWS - NEW_ROWS // 2, NEW_ROWS // 2)]
+    assert len(store.df) == len(df)
+    assert np.array_equal(np.sort(store.df[KEY_COLUMN].to_numpy()[-NEW_ROWS:]), np.sort(batch[KEY_COLUMN].to_numpy()))
+
+def test_pinned_version_ignores_later_batches(store, batch):
+    store.index(build_facet_index)
+    store.index(build_search_index)
+    pinned = store.pin()
+    facet_index = pinned.index(build_facet_index)
+
+    # Lote de outra sessão no meio do rerun: a versão fixada continua com as mesmas linhas
+    store.append(batch)
+    rows = len(pinned.df)
+
+    assert pinned.index(build_facet_index) is facet_index
+    assert facet_index.rows == pinned.index(build_search_index).rows == rows
+    assert len(facet_index.mask({}, ['India'])) == rows
+
+    # Estrutura pedida só depois do lote: construída sobre a base fixada
+    assert len(pinned.index(build_grid_index)) == rows
+
+    assert store.index(build_facet_index).rows == store.index(build_search_index).rows == rows + NEW_ROWS
+    assert len(store.pin().index(build_grid_index)) == rows + NEW_ROWS
+
+def test_clean_data_of_batch_matches_full_load(batch, df):
+    # A limpeza por lote produz as mesmas linhas que a carga da base inteira
+    pd.testing.assert_frame_equal(compact(clean_data(batch)), compact(df.iloc[-NEW_ROWS:]))
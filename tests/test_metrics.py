@@ -0,0 +1,34 @@
+import os
+
+from utils.metrics import load_records, rotated_path, summarize, write_record
+
+#------------------------------------------------------------------------------------------------------------
+# Arquivo de métricas: rotação por tamanho e leitura do arquivo rotacionado
+
+def record(page, total_ms):
+    return {'page': page, 'total_ms': total_ms, 'spans': {'view': total_ms / 2}}
+
+def test_write_record_rotates_at_max_bytes(tmp_path):
+    path = str(tmp_path / 'metrics' / 'reruns.jsonl')
+    max_bytes = 1000
+
+    for i in range(100):
+        write_record(record('Overview', float(i)), path, max_bytes=max_bytes)
+
+    assert os.path.getsize(path) <= max_bytes
+    assert max_bytes // 2 < os.path.getsize(rotated_path(path)) <= max_bytes
+    assert not os.path.exists(rotated_path(path) + '.1')
+
+    # Os dois arquivos juntos guardam as execuções mais recentes, em ordem
+    totals = load_records(path).query("span == 'total'")['ms'].tolist()
+    assert totals == [float(i) for i in range(100 - len(totals), 100)]
+
+def test_summary_reads_rotated_file(tmp_path):
+    path = str(tmp_path / 'reruns.jsonl')
+
+    write_record(record('Cities', 10.0), rotated_path(path))
+    write_record(record('Cities', 30.0), path)
+
+    summary = summarize(load_records(path))
+    assert summary.loc[('Cities', 'total'), 'p50 (ms)'] == 20.0
+    assert summary.loc[('Cities', 'total'), 'count'] == 2
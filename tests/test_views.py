@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.aggregates import TOP_COLUMNS, CountryAggregates
+from utils.facets import FacetIndex
+from utils.views import MAIN_CUISINES, cities_view, countries_view, cuisines_view, overview_view
+
+#------------------------------------------------------------------------------------------------------------
+# Resultados das páginas a partir dos agregados: mesmos valores que os groupbys originais das páginas sobre
+# as linhas dos países selecionados
+#
+# Empates nas ordenações (sort_values sem kind estável) podem aparecer em qualquer ordem nas páginas
+# originais, então os gráficos são comparados pelos valores de cada chave, e os rankings pela ordem estável
+# das linhas da base (ver RANK_COLUMNS em utils/aggregates.py).
+
+@pytest.fixture(scope='module')
+def aggregates(store_df):
+    return CountryAggregates(store_df)
+
+@pytest.fixture(scope='module')
+def facet_index(store_df):
+    return FacetIndex(store_df)
+
+def filtered(df, selected):
+    return df[df['Country Name'].isin(selected)]
+
+# Série indexada pelas colunas-chave de um resultado (categorias como texto)
+def by_key(frame, keys, column):
+    frame = frame.astype({key: 'object' for key in keys})
+
+    return frame.set_index(keys)[column].sort_index()
+
+def assert_same_values(result, expected):
+    pd.testing.assert_series_equal(result, expected, check_dtype=False, check_index_type=False, check_names=False)
+
+# Ordem do ranking das páginas: nota e votos decrescentes, empates na ordem da base
+def ranked(df):
+    return df.sort_values(by=['Aggregate rating', 'Votes'], ascending=False, kind='stable')
+
+# Uma linha por culinária listada de cada restaurante
+def explode_cuisines(df):
+    return df.assign(Cuisine=df['Cuisines'].str.split(',')).explode('Cuisine').assign(
+        Cuisine=lambda frame: frame['Cuisine'].str.strip()
+    )
+
+def test_overview_view(df, aggregates, facet_index, selections):
+    for selected in selections:
+        rows = filtered(df, selected)
+        view = overview_view(aggregates, facet_index, selected)
+
+        assert view['kpis'] == {
+            'restaurants': rows['Restaurant Name'].nunique(),
+            'countries': rows['Country Name'].nunique(),
+            'cities': rows['City'].nunique(),
+            'votes': rows['Votes'].sum(),
+            'cuisines': rows['Cuisines Unique'].nunique(),
+        }
+        expected_center = [rows['Latitude'].mean(), rows['Longitude'].mean()] if len(rows) else [0.0, 0.0]
+        assert view['map_center'] == pytest.approx(expected_center)
+        np.testing.assert_array_equal(view['country_mask'], df['Country Name'].isin(selected).to_numpy())
+
+def test_countries_view(df, aggregates, selections):
+    for selected in selections:
+        by_country = filtered(df, selected).groupby('Country Name')
+        view = countries_view(aggregates, selected)
+
+        for name, column, expected in [
+            ('df_register_country', 'Restaurant ID', by_country['Restaurant ID'].nunique()),
+            ('df_register_city', 'City', by_country['City'].nunique()),
+            ('mean_country', 'Mean Votes', by_country['Votes'].mean()),
+            ('plate_avg', 'Average Cost for two (USD)', by_country['Average Cost for two (USD)'].mean().round(2)),
+        ]:
+            result = view[name]
+            assert result[column].is_monotonic_decreasing
+            assert_same_values(by_key(result, ['Country Name'], column), expected)
+
+def test_cities_view(df, aggregates, selections):
+    for selected in selections:
+        rows = filtered(df, selected)
+        by_city = rows.groupby(['City', 'Country Name'])
+        restaurant_ratings = rows.groupby(['City', 'Country Name', 'Restaurant Name'])['Aggregate rating'].mean()
+
+        def top(counts, n):
+            counts = counts[counts > 0].sort_values(ascending=False)
+
+            return counts.head(n), counts.iloc[n - 1] if len(counts) >= n else 0
+
+        view, _ = cities_view(aggregates, selected, 'Italian')
+
+        for name, column, counts, n in [
+            ('df_rest_country', 'Aggregate rating', by_city['Aggregate rating'].count(), 10),
+            ('df_agg_fil', 'Aggregate rating',
+             (restaurant_ratings > 4).groupby(level=['City', 'Country Name']).sum(), 7),
+            ('df_agg_fil2', 'Aggregate rating',
+             (restaurant_ratings < 2.5).groupby(level=['City', 'Country Name']).sum(), 7),
+            ('df_agg_unique', 'Cuisines Unique', by_city['Cuisines Unique'].nunique(), 10),
+            ('df_cuisine_cities', 'Restaurants',
+             explode_cuisines(rows).query('Cuisine == "Italian"').groupby(['City', 'Country Name']).size(), 10),
+        ]:
+            expected, cutoff = top(counts, n)
+            result = by_key(view[name], ['City', 'Country Name'], column)
+
+            # Mesmos valores na mesma ordem; fora os empates no corte, as mesmas cidades
+            np.testing.assert_array_equal(view[name][column].to_numpy(), expected.to_numpy(), err_msg=name)
+            assert_same_values(result[result > cutoff], expected[expected > cutoff].sort_index())
+
+def test_cuisines_view(df, aggregates, selections):
+    for selected in selections:
+        for listed in [False, True]:
+            rows = filtered(df, selected)
+            key = 'Cuisine' if listed else 'Cuisines Unique'
+            cuisine_rows = explode_cuisines(ranked(rows)) if listed else ranked(rows)
+            ratings = cuisine_rows.groupby(key)['Aggregate rating'].mean()
+
+            view = cuisines_view(aggregates, selected, listed)
+
+            best = cuisine_rows.drop_duplicates(subset=key, keep='first').set_index(key).sort_index()
+            worst = cuisine_rows.drop_duplicates(subset=key, keep='last').set_index(key).sort_index()
+            leaderboard = view['leaderboard']
+            assert list(leaderboard.index) == list(best.index)
+            assert list(leaderboard['Best', 'Restaurant Name']) == list(best['Restaurant Name'])
+            assert list(leaderboard['Worst', 'Restaurant Name']) == list(worst['Restaurant Name'])
+
+            for cuisine in MAIN_CUISINES:
+                expected = (
+                    {'Restaurant': best.loc[cuisine, 'Restaurant Name'], 'Rating': best.loc[cuisine, 'Aggregate rating']}
+                    if cuisine in best.index else {'Restaurant': 'N/A', 'Rating': 'N/A'}
+                )
+                assert view['kpis'][cuisine] == expected
+
+            pd.testing.assert_frame_equal(view['df_top10'], ranked(rows)[TOP_COLUMNS].head(10), check_dtype=False,
+                                          check_categorical=False)
+
+            best_cuisines = view['best_cuisines']
+            assert_same_values(by_key(best_cuisines, [best_cuisines.columns[0]], 'Aggregate rating'),
+                               ratings.sort_values(ascending=False).head(10).sort_index())
+
+            bottom = view['bottom_cuisine']
+            assert_same_values(by_key(bottom, [bottom.columns[0]], 'Aggregate rating'),
+                               ratings.drop('Drinks Only', errors='ignore').sort_values().head(10).sort_index())
@@ -0,0 +1,425 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import estimate_size
+
+#------------------------------------------------------------------------------------------------------------
+# Agregados parciais por país
+#
+# O único filtro das páginas é o conjunto de países, então tudo o que os gráficos e KPIs precisam é
+# pré-calculado por país (ou por chave que contém o país, como cidade/país) uma única vez por carga da base
+# e combinado quando o filtro muda:
+#   - contagens e somas são somadas;
+#   - médias são guardadas como soma e contagem;
+#   - contagens de distintos são guardadas como bitmaps (int do Python) e combinadas com OR.
+# Assim o custo de cada rerun depende do número de países/cidades selecionados e não do número de linhas.
+#
+# Os mesmos parciais são atualizados por lote: add_rows(rows) incorpora linhas novas sem reprocessar as
+# anteriores (ingestão incremental). Cada lote deve trazer apenas restaurantes (Restaurant ID) ainda não
+# vistos, o que a deduplicação da ingestão garante.
+#
+# Cada lote só empilha seus parciais (custo proporcional ao lote); as tabelas são compactadas (concat +
+# groupby) quando são lidas ou quando os parciais pendentes passam do tamanho da tabela. Isso permite dobrar
+# um CSV inteiro, pedaço a pedaço, sem guardar as linhas (modo streaming, ver utils/streaming.py).
+
+# Ordem de ranking dos restaurantes usada no Top 10 e no ranking por culinária. Empates mantêm a ordem das
+# linhas na base (coluna Row), como no sort_values original. O pior restaurante de uma culinária é o último
+# nessa mesma ordem
+RANK_COLUMNS = ['Aggregate rating', 'Votes', 'Row']
+RANK_ASCENDING = [False, False, True]
+
+# Quantidade de restaurantes guardados por país para o Top N (maior N atendido por top_restaurants)
+TOP_N = 10
+
+TOP_COLUMNS = ['Restaurant ID', 'Restaurant Name', 'Country Name', 'City',
+               'Cuisines Unique', 'Average Cost for two',
+               'Aggregate rating', 'Votes']
+
+# Colunas do melhor/pior restaurante de cada culinária
+LEADER_COLUMNS = ['Restaurant Name', 'Country Name', 'City', 'Aggregate rating', 'Votes']
+
+# Colunas com contagem de distintos nos KPIs da Overview e na página de países
+DISTINCT_COLUMNS = ['Restaurant Name', 'City', 'Cuisines Unique']
+
+def _bitmap(codes):
+    bits = np.zeros(codes.max() + 1 if len(codes) else 0, dtype='bool')
+    bits[codes] = True
+
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+def _union_count(bitmaps, selected):
+    union = 0
+    for country in selected:
+        union |= bitmaps.get(country, 0)
+
+    return union.bit_count()
+
+# Tabelas de parciais somáveis (índice = chave do groupby)
+PARTIAL_TABLES = ['countries', 'restaurants', 'city_cuisines', 'cuisines', 'listed_cuisines']
+
+# Parciais pendentes tolerados antes da compactação, além do tamanho da própria tabela
+COMPACT_MIN_ROWS = 100_000
+
+# Soma parciais com o mesmo índice (mantém a ordem do groupby)
+def _add(frames):
+    return pd.concat(frames).groupby(level=list(range(frames[0].index.nlevels)), observed=True).sum()
+
+def _rank(rows):
+    return rows.sort_values(by=RANK_COLUMNS, ascending=RANK_ASCENDING)
+
+# Melhor e pior restaurante de cada chave (país, culinária): os extremos já guardados e os candidatos do lote
+# (`ranked`, já na ordem do ranking) saem de uma mesma ordenação
+def _extremes(best, worst, ranked, keys):
+    ranked = _rank(pd.concat([
+        frame for frame in [best, worst,
+                            ranked.drop_duplicates(subset=keys, keep='first'),
+                            ranked.drop_duplicates(subset=keys, keep='last')]
+        if frame is not None
+    ]))
+
+    return ranked.drop_duplicates(subset=keys, keep='first'), ranked.drop_duplicates(subset=keys, keep='last')
+
+# Todas as culinárias listadas de cada restaurante em formato CSR: as culinárias da linha i são
+# names[codes[indptr[i]:indptr[i + 1]]]. As strings são separadas uma única vez, no lote
+def cuisine_lists(cuisines):
+    split = cuisines.str.split(',')
+    codes, names = pd.factorize(split.explode().str.strip())
+    indptr = np.concatenate([[0], np.cumsum(split.str.len().to_numpy())])
+
+    return indptr, codes, names
+
+#------------------------------------------------------------------------------------------------------------
+# Índice de ranking
+#
+# top, best_by_cuisine e worst_by_cuisine guardam os candidatos já na ordem global do ranking. Os N primeiros
+# de qualquer seleção de países são os N primeiros candidatos desses países, então a consulta só percorre o
+# índice descartando os países fora do filtro, sem ordenar nada. Cada lote é ordenado uma única vez e só os
+# seus candidatos são intercalados com o índice.
+
+class CountryAggregates:
+    def __init__(self, df=None):
+        self.rows = 0
+
+        # Código de cada valor já visto nas colunas de distintos (código = posição no bitmap)
+        self.codes = {column: {} for column in DISTINCT_COLUMNS}
+        self.distinct = {column: {} for column in DISTINCT_COLUMNS}
+
+        self._tables = dict.fromkeys(PARTIAL_TABLES)
+        self._pending = {name: [] for name in PARTIAL_TABLES}
+        self._cities = None
+        self._affected_cities = []
+        # Leituras compactam as tabelas, então sessões concorrentes passam pelo mesmo lock que add_rows
+        self._lock = threading.RLock()
+
+        self.top = None
+        self.best_by_cuisine = None
+        self.worst_by_cuisine = None
+
+        # Mesmos extremos por culinária listada (coluna Cuisine): um restaurante concorre em todas as suas
+        self.best_by_listed = None
+        self.worst_by_listed = None
+
+        if df is not None:
+            self.add_rows(df)
+
+    # =====================================
+    # Incorpora um lote de linhas já tratadas
+    # =====================================
+    def add_rows(self, rows):
+        with self._lock:
+            return self._add_rows(rows)
+
+    def _add_rows(self, rows):
+        rows = rows.assign(Row=np.arange(self.rows, self.rows + len(rows)))
+        self.rows += len(rows)
+
+        self._update_distinct(rows)
+
+        # Tabela por país: somas e contagens para médias
+        by_country = rows.groupby('Country Name', observed=True)
+        self._push('countries', pd.DataFrame({
+            'Restaurant ID': by_country['Restaurant ID'].nunique(),
+            'Votes Sum': by_country['Votes'].sum(),
+            'Votes Count': by_country['Votes'].count(),
+            'Cost Sum': by_country['Average Cost for two'].sum(),
+            'Cost Count': by_country['Average Cost for two'].count(),
+            'Cost USD Sum': by_country['Average Cost for two (USD)'].sum(),
+            'Cost USD Count': by_country['Average Cost for two (USD)'].count(),
+            'Latitude Sum': by_country['Latitude'].sum(),
+            'Longitude Sum': by_country['Longitude'].sum(),
+            'Rows': by_country.size(),
+        }))
+
+        # Parciais por cidade/país; a tabela de cidades é recalculada só para as cidades afetadas, na leitura
+        by_restaurant = rows.groupby(['City', 'Country Name', 'Restaurant Name'], observed=True)['Aggregate rating']
+        self._push('restaurants', pd.DataFrame({
+            'Rating Sum': by_restaurant.sum(),
+            'Rating Count': by_restaurant.count(),
+        }))
+        self._push('city_cuisines',
+                   rows.groupby(['City', 'Country Name', 'Cuisines Unique'], observed=True).size().rename('Rows').to_frame())
+        self._affected_cities.append(rows[['City', 'Country Name']].drop_duplicates())
+
+        # Parciais por cidade/país/culinária listada: um restaurante "Italian, Pizza, Cafe" conta nas três.
+        # Só as colunas usadas são repetidas por culinária (a base não é explodida)
+        indptr, codes, names = cuisine_lists(rows['Cuisines'])
+        positions = np.repeat(np.arange(len(rows)), np.diff(indptr))
+
+        listed = pd.DataFrame({
+            'Position': positions,
+            'City': rows['City'].to_numpy()[positions],
+            'Country Name': rows['Country Name'].to_numpy()[positions],
+            'Cuisine': names[codes],
+            'Aggregate rating': rows['Aggregate rating'].to_numpy()[positions],
+        }).drop_duplicates(subset=['Position', 'Cuisine'])
+
+        by_listed = listed.groupby(['City', 'Country Name', 'Cuisine'], observed=True)['Aggregate rating']
+        self._push('listed_cuisines', pd.DataFrame({
+            'Restaurants': by_listed.size(),
+            'Rating Sum': by_listed.sum(),
+            'Rating Count': by_listed.count(),
+        }))
+
+        # Soma e contagem das notas por país/culinária (média das culinárias)
+        by_cuisine = rows.groupby(['Country Name', 'Cuisines Unique'], observed=True)['Aggregate rating']
+        self._push('cuisines', pd.DataFrame({
+            'Rating Sum': by_cuisine.sum(),
+            'Rating Count': by_cuisine.count(),
+        }))
+
+        # Melhores restaurantes por país e melhor/pior por país/culinária
+        ranked = _rank(rows[TOP_COLUMNS + ['Row']])
+        keys = ['Country Name', 'Cuisines Unique']
+
+        self.top = _rank(pd.concat([
+            frame for frame in [self.top, ranked.groupby('Country Name', sort=False, observed=True).head(TOP_N)]
+            if frame is not None
+        ])).groupby('Country Name', sort=False, observed=True).head(TOP_N)
+
+        self.best_by_cuisine, self.worst_by_cuisine = _extremes(
+            self.best_by_cuisine, self.worst_by_cuisine, ranked, keys
+        )
+
+        # Por culinária listada: o melhor (pior) restaurante de uma culinária é o melhor (pior) entre os que têm
+        # a mesma lista de culinárias que a contém. Basta explodir os extremos de cada país/lista, tirados da
+        # ordenação acima
+        order = ranked['Row'].to_numpy() - (self.rows - len(rows))
+        lists = pd.factorize(rows['Country Name'])[0] * len(rows) + pd.factorize(rows['Cuisines'])[0]
+        lists = lists[order]
+
+        first = np.unique(lists, return_index=True)[1]
+        last = len(lists) - 1 - np.unique(lists[::-1], return_index=True)[1]
+        picks = np.concatenate([first, last])
+        extremes = ranked.iloc[picks]
+
+        indptr, codes, names = cuisine_lists(rows['Cuisines'].iloc[order[picks]])
+        candidates = (
+            extremes.iloc[np.repeat(np.arange(len(extremes)), np.diff(indptr))]
+            .assign(Cuisine=names[codes])
+            .drop_duplicates(subset=['Row', 'Cuisine'])
+        )
+
+        self.best_by_listed, self.worst_by_listed = _extremes(
+            self.best_by_listed, self.worst_by_listed, _rank(candidates), ['Country Name', 'Cuisine']
+        )
+
+        return self
+
+    def _update_distinct(self, rows):
+        for column in DISTINCT_COLUMNS:
+            codes = self.codes[column]
+            inverse, uniques = pd.factorize(rows[column])
+            unique_codes = np.array([codes.setdefault(value, len(codes)) for value in uniques], dtype='int64')
+
+            row_codes = pd.Series(unique_codes[inverse], index=rows.index)
+            bitmaps = self.distinct[column]
+
+            for country, group in row_codes.groupby(rows['Country Name'], observed=True):
+                bitmaps[country] = bitmaps.get(country, 0) | _bitmap(group.to_numpy())
+
+    def _push(self, name, partial):
+        pending = self._pending[name]
+        pending.append(partial)
+
+        table = self._tables[name]
+        if sum(len(frame) for frame in pending) > (0 if table is None else len(table)) + COMPACT_MIN_ROWS:
+            self._compact(name)
+
+    def _compact(self, name):
+        with self._lock:
+            pending = self._pending[name]
+
+            if pending:
+                table = self._tables[name]
+                self._tables[name] = _add(pending if table is None else [table] + pending)
+                self._pending[name] = []
+
+            return self._tables[name]
+
+    # Memória estimada das tabelas, candidatos e bitmaps, usada pelos caches LRU (ver utils/cache.py): os
+    # agregados dos filtros da sidebar ficam no cache de resultados das páginas
+    def estimated_bytes(self):
+        with self._lock:
+            frames = [*self._tables.values(), *(frame for pending in self._pending.values() for frame in pending),
+                      self._cities, self.top, self.best_by_cuisine, self.worst_by_cuisine,
+                      self.best_by_listed, self.worst_by_listed]
+
+            return (
+                sum(estimate_size(frame) for frame in frames if frame is not None)
+                + sum(sys.getsizeof(bitmap) for bitmaps in self.distinct.values() for bitmap in bitmaps.values())
+                + sum(sys.getsizeof(codes) + sum(map(sys.getsizeof, codes)) for codes in self.codes.values())
+            )
+
+    @property
+    def countries(self):
+        return self._compact('countries')
+
+    @property
+    def restaurants(self):
+        return self._compact('restaurants')
+
+    @property
+    def city_cuisines(self):
+        return self._compact('city_cuisines')
+
+    @property
+    def cuisines(self):
+        return self._compact('cuisines')
+
+    @property
+    def listed_cuisines(self):
+        return self._compact('listed_cuisines')
+
+    # Tabela por cidade/país (cada cidade pertence a um único país na chave, então basta selecionar).
+    # Só as cidades presentes nos lotes desde a última leitura são recalculadas
+    @property
+    def cities(self):
+        with self._lock:
+            return self._update_cities()
+
+    def _update_cities(self):
+        if not self._affected_cities:
+            return self._cities
+
+        affected = pd.MultiIndex.from_frame(pd.concat(self._affected_cities).drop_duplicates())
+        self._affected_cities = []
+
+        restaurants = self.restaurants[self.restaurants.index.droplevel('Restaurant Name').isin(affected)]
+        mean_rating = restaurants['Rating Sum'] / restaurants['Rating Count']
+
+        city_cuisines = self.city_cuisines[self.city_cuisines.index.droplevel('Cuisines Unique').isin(affected)]
+        by_city = city_cuisines.groupby(level=['City', 'Country Name'], observed=True)['Rows']
+
+        cities = pd.DataFrame({
+            'Restaurants': by_city.sum(),
+            'Above 4': (mean_rating > 4).groupby(level=['City', 'Country Name'], observed=True).sum(),
+            'Below 2.5': (mean_rating < 2.5).groupby(level=['City', 'Country Name'], observed=True).sum(),
+            'Cuisines Unique': by_city.size(),
+        })
+
+        if self._cities is not None:
+            cities = pd.concat([self._cities[~self._cities.index.isin(affected)], cities]).sort_index()
+
+        self._cities = cities
+
+        return cities
+
+    # =====================================
+    # Combinação dos parciais para os países selecionados
+    # =====================================
+    def _selected(self, selected):
+        return self.countries.loc[self.countries.index.isin(selected)]
+
+    def overview_kpis(self, selected):
+        countries = self._selected(selected)
+
+        return {
+            'restaurants': _union_count(self.distinct['Restaurant Name'], selected),
+            'countries': len(countries),
+            'cities': _union_count(self.distinct['City'], selected),
+            'votes': int(countries['Votes Sum'].sum()),
+            'cuisines': _union_count(self.distinct['Cuisines Unique'], selected),
+        }
+
+    # Sem restaurantes na seleção (ex.: filtros sem resultado) o mapa fica centrado em (0, 0)
+    def map_center(self, selected):
+        countries = self._selected(selected)
+        rows = countries['Rows'].sum()
+
+        if rows == 0:
+            return [0.0, 0.0]
+
+        return [countries['Latitude Sum'].sum() / rows, countries['Longitude Sum'].sum() / rows]
+
+    # Indicadores por país, com os mesmos nomes de coluna dos groupby originais
+    def country_stats(self, selected):
+        countries = self._selected(selected)
+        cities = self.distinct['City']
+
+        return pd.DataFrame({
+            'Restaurant ID': countries['Restaurant ID'],
+            'City': [cities[country].bit_count() for country in countries.index],
+            'Mean Votes': countries['Votes Sum'] / countries['Votes Count'],
+            'Average Cost for two': countries['Cost Sum'] / countries['Cost Count'],
+            'Average Cost for two (USD)': countries['Cost USD Sum'] / countries['Cost USD Count'],
+        }, index=countries.index)
+
+    def city_stats(self, selected):
+        return self.cities.loc[self.cities.index.get_level_values('Country Name').isin(selected)]
+
+    # Nota média por culinária, na ordem do groupby original. Com listed=True cada restaurante conta em todas
+    # as culinárias listadas, não só na primeira
+    def cuisine_ratings(self, selected, listed=False):
+        if listed:
+            cuisines = self._listed(selected).groupby(level='Cuisine', observed=True).sum().rename_axis('Cuisines Unique')
+        else:
+            cuisines = self.cuisines.loc[self.cuisines.index.get_level_values('Country Name').isin(selected)]
+
+        totals = cuisines.groupby(level='Cuisines Unique', observed=True).sum()
+
+        return (totals['Rating Sum'] / totals['Rating Count']).rename('Aggregate rating')
+
+    def _listed(self, selected):
+        listed = self.listed_cuisines
+
+        return listed.loc[listed.index.get_level_values('Country Name').isin(selected)]
+
+    # Todas as culinárias listadas nos países selecionados, em ordem alfabética
+    def cuisine_names(self, selected):
+        return sorted(self._listed(selected).index.get_level_values('Cuisine').unique())
+
+    # Restaurantes que listam a culinária, por cidade/país
+    def cuisine_cities(self, selected, cuisine):
+        listed = self._listed(selected)
+        listed = listed[listed.index.get_level_values('Cuisine') == cuisine]
+
+        return listed['Restaurants'].droplevel('Cuisine')
+
+    def top_restaurants(self, selected, n=TOP_N):
+        if n > TOP_N:
+            raise ValueError(f'top_restaurants keeps only the top {TOP_N} restaurants per country')
+
+        return self.top[self.top['Country Name'].isin(selected)].head(n)[TOP_COLUMNS]
+
+    # Melhor e pior restaurante de cada culinária entre os países selecionados, indexado pela culinária
+    # (colunas Best/Worst x LEADER_COLUMNS). Os KPIs por culinária são consultas a essa tabela. Com
+    # listed=True um restaurante concorre em todas as culinárias listadas, não só na primeira
+    def cuisine_leaderboard(self, selected, listed=False):
+        if listed:
+            key, best, worst = 'Cuisine', self.best_by_listed, self.worst_by_listed
+        else:
+            key, best, worst = 'Cuisines Unique', self.best_by_cuisine, self.worst_by_cuisine
+
+        best = best[best['Country Name'].isin(selected)]
+        worst = worst[worst['Country Name'].isin(selected)]
+
+        return pd.concat({
+            'Best': best.drop_duplicates(subset=key, keep='first').set_index(key)[LEADER_COLUMNS],
+            'Worst': worst.drop_duplicates(subset=key, keep='last').set_index(key)[LEADER_COLUMNS],
+        }, axis=1).sort_index()
+
+def build_country_aggregates(df):
+    return CountryAggregates(df)
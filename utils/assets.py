@@ -0,0 +1,48 @@
+import functools
+import io
+import os
+
+#------------------------------------------------------------------------------------------------------------
+# Logo reduzido
+#
+# logo.png tem 1024x1024 px (1,3 MB) e é exibido com no máximo a largura da sidebar. A versão reduzida
+# (LOGO_WIDTH px, o dobro da sidebar para telas HiDPI) é gerada uma única vez ao lado do original e regerada
+# só quando logo.png muda. Os bytes ficam em memória no processo, então as páginas não decodificam nem leem a
+# imagem a cada execução. Sem permissão de escrita na pasta, a versão reduzida fica só em memória.
+
+LOGO_PATH = 'logo.png'
+
+LOGO_WIDTH = 600
+
+def scaled_path(path, width):
+    root, ext = os.path.splitext(path)
+
+    return f'{root}_{width}{ext}'
+
+@functools.lru_cache(maxsize=4)
+def _scaled_logo(path, width, mtime):
+    scaled = scaled_path(path, width)
+
+    if os.path.exists(scaled) and os.path.getmtime(scaled) >= mtime:
+        with open(scaled, 'rb') as file:
+            return file.read()
+
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.thumbnail((width, width), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+
+    data = buffer.getvalue()
+    try:
+        with open(scaled, 'wb') as file:
+            file.write(data)
+    except OSError:
+        pass
+
+    return data
+
+# Bytes PNG do logo reduzido, para st.image
+def logo(path=LOGO_PATH, width=LOGO_WIDTH):
+    return _scaled_logo(path, width, os.path.getmtime(path))
@@ -0,0 +1,136 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------------------------------------
+# Cache LRU dos resultados por seleção de países
+#
+# Os usuários alternam entre poucas seleções do filtro; o resultado de cada página para uma seleção fica
+# guardado com a chave (página, frozenset dos países). A remoção segue a ordem de uso (LRU) e respeita dois
+# limites: número de entradas e memória estimada. O cache é compartilhado entre sessões, por isso o acesso
+# é protegido por lock, e os valores guardados não devem ser alterados por quem os recebe.
+
+MAX_ENTRIES = 64
+MAX_BYTES = 64 * 1024 ** 2
+
+# Estimativa de memória de um resultado (DataFrames, arrays, agregados e coleções desses)
+def estimate_size(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    # Estruturas com estimativa própria (ex.: CountryAggregates)
+    if hasattr(value, 'estimated_bytes'):
+        return value.estimated_bytes()
+    # Figuras: o tamanho do JSON acompanha o dos arrays guardados nelas. O plotly só é consultado se já foi
+    # importado (por uma página com gráficos); sem ele não há figuras no cache
+    plotly = sys.modules.get('plotly.basedatatypes')
+    if plotly is not None and isinstance(value, plotly.BaseFigure):
+        return len(value.to_json(validate=False))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+
+    return sys.getsizeof(value)
+
+class LRUCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+
+            # Um valor maior que o limite inteiro não é guardado
+            if size > self.max_bytes:
+                return value
+
+            self._entries[key] = (value, size)
+            self.bytes += size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+        return value
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is missing:
+            value = self.put(key, compute())
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+# Chave do cache para o resultado de uma página com uma seleção de países (e demais opções da página)
+def selection_key(page, selected, *options):
+    return (page, frozenset(selected), *options)
+
+# Um cache novo por versão da base (carga ou lote novo, ver get_index), então recarregar os dados também limpa
+# os resultados
+def build_view_cache(df):
+    return LRUCache()
+
+#------------------------------------------------------------------------------------------------------------
+# Cache das figuras Plotly
+#
+# Montar um px.bar com os ajustes de layout custa dezenas de milissegundos, bem mais que os dados do
+# gráfico. Cada figura fica guardada com a chave (página, gráfico, chave do resultado da página), então um
+# rerun causado por outro widget reaproveita a figura pronta. As figuras são compartilhadas entre sessões e
+# não devem ser alteradas depois de guardadas.
+
+FIGURE_MAX_ENTRIES = 256
+FIGURE_MAX_BYTES = 32 * 1024 ** 2
+
+def figure_key(view_key, chart):
+    return (*view_key, chart)
+
+def build_figure_cache(df):
+    return LRUCache(max_entries=FIGURE_MAX_ENTRIES, max_bytes=FIGURE_MAX_BYTES)
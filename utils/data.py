@@ -0,0 +1,298 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.dedup import Deduplicator
+from utils.metrics import span
+
+#------------------------------------------------------------------------------------------------------------
+# Base de dados compartilhada por todas as páginas do dashboard
+
+DATA_PATH = 'dataset/zomato.csv'
+
+# Snapshot colunar gerado a partir do CSV (ver utils/snapshot.py)
+SNAPSHOT_PATH = 'dataset/zomato.arrow'
+
+# Linhas lidas por vez do CSV
+CHUNK_SIZE = 100_000
+
+# Pasta dos lotes diários incorporados incrementalmente (ver utils/ingest.py)
+INCOMING_DIR = 'dataset/incoming'
+
+# Tabela de câmbio para dólar usada na coluna Average Cost for two (USD)
+RATES_PATH = 'dataset/currency_rates.csv'
+
+# A partir deste tamanho o CSV é agregado em streaming nas páginas que só usam agregados (ver utils/streaming.py)
+STREAMING_MIN_BYTES = 1024 ** 3
+
+#------------------------------------------------------------------------------------------------------------
+# Tabelas de tradução das colunas derivadas
+#
+# Os nomes dos países já estão corrigidos aqui (Singapure -> Singapore, New Zeland -> New Zealand), então a
+# correção é feita na mesma passada que traduz o código do país.
+
+COUNTRIES = {
+1: "India",
+14: "Australia",
+30: "Brazil",
+37: "Canada",
+94: "Indonesia",
+148: "New Zealand",
+162: "Philippines",
+166: "Qatar",
+184: "Singapore",
+189: "South Africa",
+191: "Sri Lanka",
+208: "Turkey",
+214: "United Arab Emirates",
+215: "England",
+216: "United States of America",
+}
+
+# Qualquer faixa de preço fora da tabela é considerada gourmet
+PRICE_TYPES = {
+1: "cheap",
+2: "normal",
+3: "expensive",
+}
+DEFAULT_PRICE_TYPE = "gourmet"
+
+COLORS = {
+"3F7E00": "darkgreen",
+"5BA829": "green",
+"9ACD32": "lightgreen",
+"CDD614": "orange",
+"FFBA00": "red",
+"CBCBC8": "darkred",
+"FF7800": "darkred",
+}
+
+#------------------------------------------------------------------------------------------------------------
+# Bloco limpeza e tratamento de dados
+#
+# Cada etapa recebe e devolve um DataFrame e trabalha coluna a coluna (map/str vetorizados), sem apply por
+# linha. clean_data() aplica as etapas de CLEANING_STEPS em ordem.
+#
+# As etapas também funcionam pedaço a pedaço: a deduplicação guarda os restaurantes já vistos entre os
+# pedaços (ver utils/dedup.py), então a base pode ser lida e tratada em chunks (read_clean_chunks).
+
+# Retirando possíveis espaços a mais nos campos object
+def strip_text_columns(df):
+    df = df.copy()
+
+    for col in df.select_dtypes(include=['object']).columns:
+        df[col] = df[col].str.strip()
+
+    return df
+
+# Exclusão dos dados NaN na coluna Cuisine. Métodos de imputação foram testados porém não foram efetivos
+def drop_missing_cuisines(df):
+    return df[df['Cuisines'].notna()]
+
+# Eliminar linhas duplicadas: uma linha por Restaurant ID (vale a primeira versão)
+def drop_duplicate_restaurants(df):
+    return Deduplicator()(df)
+
+def add_derived_columns(df):
+    df = df.copy()
+
+    df['Country Name'] = df['Country Code'].map(COUNTRIES)
+    df['Price Type'] = df['Price range'].map(PRICE_TYPES).fillna(DEFAULT_PRICE_TYPE)
+    df['Color Name'] = df['Rating color'].map(COLORS)
+    df['Cuisines Unique'] = df['Cuisines'].str.split(',', n=1).str[0]
+
+    return df
+
+#------------------------------------------------------------------------------------------------------------
+# Custo em moeda comum
+#
+# Average Cost for two está na moeda local de cada restaurante. A coluna Average Cost for two (USD) converte
+# o valor com a tabela RATES_PATH (Currency, Country Code, USD Rate): a taxa vale para a moeda em qualquer
+# país, e uma linha com Country Code corrige rótulos ambíguos da base (Dollar($) na Austrália, no Canadá e em
+# Singapura; Botswana Pula(P) nas Filipinas, que usam o peso filipino). As taxas são médias de 2019, época
+# da coleta da base. Um país novo com moeda conhecida não exige mudança de código; moedas fora da tabela
+# ficam sem valor em dólar.
+#
+# Valores acima de MAX_COST_USD são erros de digitação da base (ex.: 25000017 na Austrália) e ficam sem
+# valor em dólar, para não distorcer as médias.
+
+MAX_COST_USD = 10_000
+
+# A tabela é lida uma vez por versão do arquivo (e não a cada pedaço da base)
+@functools.lru_cache(maxsize=1)
+def _read_currency_rates(path, mtime):
+    rates = pd.read_csv(path, dtype={'Country Code': 'Int64'})
+
+    return (
+        rates[rates['Country Code'].isna()].set_index('Currency')['USD Rate'],
+        rates[rates['Country Code'].notna()].set_index(['Country Code', 'Currency'])['USD Rate'],
+    )
+
+def load_currency_rates(path=RATES_PATH):
+    return _read_currency_rates(path, os.path.getmtime(path))
+
+def add_cost_usd(df, rates=None):
+    currency_rates, country_rates = rates if rates is not None else load_currency_rates()
+
+    rate = df['Currency'].map(currency_rates).to_numpy(dtype='float64')
+
+    keys = pd.MultiIndex.from_arrays([df['Country Code'].astype('int64'), df['Currency']])
+    positions = country_rates.index.get_indexer(keys)
+    override = positions >= 0
+    rate[override] = country_rates.to_numpy()[positions[override]]
+
+    df = df.copy()
+    cost = df['Average Cost for two'].to_numpy(dtype='float64') * rate
+    df['Average Cost for two (USD)'] = np.where(cost <= MAX_COST_USD, cost, np.nan)
+
+    return df
+
+CLEANING_STEPS = [
+    strip_text_columns,
+    drop_missing_cuisines,
+    drop_duplicate_restaurants,
+    add_derived_columns,
+    add_cost_usd,
+]
+
+# Mesmas etapas, com a deduplicação compartilhada entre vários pedaços/lotes
+def cleaning_steps(dedup):
+    return [dedup if step is drop_duplicate_restaurants else step for step in CLEANING_STEPS]
+
+def clean_data(df, steps=CLEANING_STEPS):
+    for step in steps:
+        df = step(df)
+
+    return df
+
+# `usecols`/`dtype` são repassados ao read_csv (o modo streaming lê só as colunas que usa). A leitura e a
+# limpeza de cada pedaço entram nos tempos da execução da página (ver utils/metrics.py)
+def read_clean_chunks(path=DATA_PATH, dedup=None, chunksize=CHUNK_SIZE, usecols=None, dtype=None):
+    steps = cleaning_steps(dedup if dedup is not None else Deduplicator())
+    reader = pd.read_csv(path, chunksize=chunksize, usecols=usecols, dtype=dtype)
+
+    while True:
+        with span('csv_parse'):
+            chunk = next(reader, None)
+
+        if chunk is None:
+            return
+
+        with span('cleaning'):
+            chunk = clean_data(chunk, steps)
+
+        yield chunk
+
+# `dedup` recebe o relatório de duplicatas da carga (ver Deduplicator.report)
+def load_data(path=DATA_PATH, dedup=None):
+    return pd.concat(read_clean_chunks(path, dedup))
+
+#------------------------------------------------------------------------------------------------------------
+# Cache da base tratada
+#
+# A base é lida e tratada uma única vez por processo e o mesmo DataFrame é reaproveitado entre reruns e
+# sessões (st.cache_resource não copia o objeto). Por isso as páginas nunca devem alterar `df` in-place:
+# filtros como df[mask] já devolvem uma cópia.
+#
+# Quando existe um snapshot colunar mais novo que o CSV ele é usado no lugar do CSV, evitando o parse e a
+# limpeza na carga.
+#
+# Invalidação: a data de modificação do arquivo faz parte da chave do cache, então substituir o CSV (ou
+# regerar o snapshot) gera uma nova carga automaticamente; clear_data_cache() força a recarga manualmente
+# (botão "Reload data" da sidebar da Home, ver utils/sidebar.py).
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + '.arrow'
+
+# O snapshot também precisa ser mais novo que a tabela de câmbio (a coluna em dólar é materializada nele) e
+# estar no formato atual (ver SNAPSHOT_VERSION em utils/snapshot.py)
+def _data_source(path):
+    snapshot = snapshot_path(path)
+    newest = max(os.path.getmtime(path), os.path.getmtime(RATES_PATH))
+
+    if os.path.exists(snapshot) and os.path.getmtime(snapshot) >= newest:
+        if _snapshot_current(snapshot, os.path.getmtime(snapshot)):
+            return snapshot
+
+    return path
+
+# A versão é lida uma vez por arquivo (e não a cada rerun)
+@functools.lru_cache(maxsize=4)
+def _snapshot_current(snapshot, mtime):
+    from utils.snapshot import SNAPSHOT_VERSION, snapshot_version
+
+    return snapshot_version(snapshot) == SNAPSHOT_VERSION
+
+def _load_source(source, dedup):
+    if source.endswith('.arrow'):
+        from utils.snapshot import load_snapshot
+        with span('snapshot_load'):
+            return load_snapshot(source, dedup)
+
+    return load_data(source, dedup)
+
+# A base carregada fica em um RestaurantStore (ver utils/ingest.py), que também incorpora os lotes novos de
+# dataset/incoming/ e guarda as estruturas derivadas da base.
+
+@st.cache_resource(show_spinner='Loading restaurants...', max_entries=1)
+def _cached_store(source, mtime):
+    from utils.ingest import RestaurantStore
+
+    # Com o snapshot (já deduplicado) os restaurantes só são registrados, com as impressões digitais gravadas
+    dedup = Deduplicator()
+    df = _load_source(source, dedup)
+
+    return RestaurantStore(df, dedup)
+
+# Incorpora os lotes novos uma única vez e fixa a versão da base usada por todo o rerun (ver StoreVersion em
+# utils/ingest.py): a página chama get_store no início e pega dela `df` e as estruturas
+def get_store(path=DATA_PATH):
+    source = _data_source(path)
+    store = _cached_store(source, os.path.getmtime(source))
+
+    with span('ingest'):
+        store.ingest_incoming(INCOMING_DIR)
+
+    return store.pin()
+
+# Estruturas derivadas da base (índices, agregados) seguem a mesma regra: `builder(df)` roda uma única vez
+# por carga da base e o resultado é compartilhado entre reruns e sessões. Com um lote novo, as estruturas
+# incrementais são atualizadas e as demais reconstruídas no próximo acesso. O span de cada estrutura mede o
+# acesso, que inclui a construção (groupbys dos agregados, índices) na primeira vez.
+
+def get_index(store, builder):
+    with span(builder.__name__):
+        return store.index(builder)
+
+# Começa a construir a estrutura em segundo plano (ver RestaurantStore.warm); o get_index seguinte só espera
+# o que faltar
+def warm_index(store, builder):
+    store.warm(builder)
+
+# As páginas que só usam agregados (Countries, Cities, Cuisines) pegam sua versão da base por aqui: a partir
+# de STREAMING_MIN_BYTES o CSV é agregado pedaço a pedaço, sem manter as linhas em memória (df=None), e os
+# lotes novos são incorporados aos mesmos agregados. Abaixo disso vale a base carregada (get_store).
+
+@st.cache_resource(show_spinner='Aggregating restaurants...', max_entries=1)
+def _cached_stream_store(path, mtime):
+    from utils.streaming import stream_store
+
+    return stream_store(path)
+
+def get_aggregate_store(path=DATA_PATH):
+    if os.path.getsize(path) < STREAMING_MIN_BYTES:
+        return get_store(path)
+
+    store = _cached_stream_store(path, os.path.getmtime(path))
+
+    with span('ingest'):
+        store.ingest_incoming(INCOMING_DIR)
+
+    return store.pin()
+
+def clear_data_cache():
+    _cached_store.clear()
+    _cached_stream_store.clear()
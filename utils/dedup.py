@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------------------------------------
+# Deduplicação por chave (Restaurant ID) + impressão digital do conteúdo
+#
+# Em vez de um drop_duplicates sobre as 21 colunas com a base inteira em memória, cada restaurante é
+# identificado pelo Restaurant ID e cada versão dele por um hash de 64 bits das demais colunas. O
+# Deduplicator guarda só esse par (ID -> hash) para os restaurantes já vistos, em arrays numpy ordenados,
+# então pode ser aplicado pedaço a pedaço enquanto o CSV é lido, sem laço por linha:
+#   - ID novo: a linha é mantida;
+#   - ID já visto com o mesmo hash: duplicata exata, descartada;
+#   - ID já visto com hash diferente: versão conflitante, descartada (vale a primeira) e registrada.
+
+KEY_COLUMN = 'Restaurant ID'
+
+FINGERPRINT_COLUMNS = ['Restaurant Name', 'Country Code', 'City', 'Address', 'Locality',
+                       'Locality Verbose', 'Longitude', 'Latitude', 'Cuisines',
+                       'Average Cost for two', 'Currency', 'Has Table booking',
+                       'Has Online delivery', 'Is delivering now', 'Switch to order menu',
+                       'Price range', 'Aggregate rating', 'Rating color', 'Rating text', 'Votes']
+
+# Quantidade máxima de linhas conflitantes guardadas no relatório
+MAX_CONFLICT_SAMPLES = 100
+
+# Usa só as colunas presentes (o modo streaming lê um subconjunto das colunas, ver utils/streaming.py)
+def fingerprint(df):
+    columns = [column for column in FINGERPRINT_COLUMNS if column in df.columns]
+
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+# Índice compacto ID -> hash: corridas ordenadas de arrays numpy (16 bytes por restaurante), consultadas com
+# searchsorted. Corridas de tamanho parecido são intercaladas, então cada restaurante é reordenado
+# O(log n) vezes no total.
+class _KeyIndex:
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(ids) for ids, _ in self.runs)
+
+    # Hash guardado de cada ID (e máscara dos IDs encontrados)
+    def lookup(self, ids):
+        found = np.zeros(len(ids), dtype='bool')
+        hashes = np.zeros(len(ids), dtype='uint64')
+
+        for run_ids, run_hashes in self.runs:
+            positions = np.minimum(np.searchsorted(run_ids, ids), len(run_ids) - 1)
+            hit = run_ids[positions] == ids
+            found |= hit
+            hashes[hit] = run_hashes[positions[hit]]
+
+        return found, hashes
+
+    def add(self, ids, hashes):
+        if len(ids) == 0:
+            return
+
+        order = np.argsort(ids, kind='stable')
+        self.runs.append((ids[order], hashes[order]))
+
+        while len(self.runs) > 1 and len(self.runs[-2][0]) <= 2 * len(self.runs[-1][0]):
+            (ids_a, hashes_a), (ids_b, hashes_b) = self.runs.pop(), self.runs.pop()
+            ids, hashes = np.concatenate([ids_b, ids_a]), np.concatenate([hashes_b, hashes_a])
+            order = np.argsort(ids, kind='stable')
+            self.runs.append((ids[order], hashes[order]))
+
+class Deduplicator:
+    def __init__(self):
+        self.seen = _KeyIndex()
+        self.rows = 0
+        self.duplicates = 0
+        self.conflicts = 0
+        self.conflict_samples = []
+
+    # Registra restaurantes já existentes sem filtrar. `hashes` são as impressões digitais já calculadas das
+    # linhas (ex.: gravadas no snapshot, ver utils/snapshot.py)
+    def seed(self, df, hashes=None):
+        ids = df[KEY_COLUMN].to_numpy(dtype='int64')
+        hashes = fingerprint(df) if hashes is None else hashes
+        found, _ = self.seen.lookup(ids)
+        first = ~pd.Series(ids).duplicated().to_numpy() & ~found
+
+        self.seen.add(ids[first], hashes[first])
+
+        return self
+
+    def __contains__(self, restaurant_id):
+        return bool(self.seen.lookup(np.array([restaurant_id], dtype='int64'))[0][0])
+
+    def __call__(self, df):
+        kept, update = self._filter(df)
+        self._register(*update)
+
+        return kept
+
+    # Mesma filtragem, sem registrar nada: os restaurantes do lote só entram no índice em commit(). Um lote
+    # que falha depois da deduplicação (ver RestaurantStore.append) não deixa IDs registrados sem as linhas
+    def deferred(self):
+        return _DeferredDeduplicator(self)
+
+    # Linhas mantidas e o que o lote acrescenta ao índice e ao relatório
+    def _filter(self, df):
+        ids = df[KEY_COLUMN].to_numpy(dtype='int64')
+        hashes = fingerprint(df)
+
+        # Hash da versão mantida de cada ID: a já vista ou, para IDs novos, a primeira deste pedaço
+        found, kept = self.seen.lookup(ids)
+        first = ~found & ~pd.Series(ids).duplicated().to_numpy()
+
+        first_hashes = pd.Series(hashes[first], index=ids[first])
+        repeated = ~found & ~first
+        kept[repeated] = first_hashes.reindex(ids[repeated]).to_numpy()
+
+        duplicate = ~first & (kept == hashes)
+        conflicting = np.flatnonzero(~first & (kept != hashes))
+
+        update = (ids[first], hashes[first], len(df), int(duplicate.sum()), len(conflicting),
+                  df.iloc[conflicting[:MAX_CONFLICT_SAMPLES]])
+
+        return df[first], update
+
+    def _register(self, ids, hashes, rows, duplicates, conflicts, samples):
+        self.seen.add(ids, hashes)
+        self.rows += rows
+        self.duplicates += duplicates
+        self.conflicts += conflicts
+
+        room = MAX_CONFLICT_SAMPLES - sum(len(sample) for sample in self.conflict_samples)
+        if len(samples) and room > 0:
+            self.conflict_samples.append(samples.iloc[:room])
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'kept': self.rows - self.duplicates - self.conflicts,
+            'duplicates': self.duplicates,
+            'conflicts': self.conflicts,
+        }
+
+    # Versões conflitantes vistas (até MAX_CONFLICT_SAMPLES), ao lado da versão mantida de cada ID
+    def conflict_versions(self, kept_rows=None):
+        if not self.conflict_samples:
+            return pd.DataFrame(columns=[KEY_COLUMN] + FINGERPRINT_COLUMNS)
+
+        conflicts = pd.concat(self.conflict_samples).assign(Version='conflicting')
+
+        if kept_rows is not None:
+            kept = kept_rows[kept_rows[KEY_COLUMN].isin(conflicts[KEY_COLUMN])].assign(Version='kept')
+            conflicts = pd.concat([kept[conflicts.columns], conflicts])
+
+        return conflicts.sort_values(by=KEY_COLUMN, kind='stable')
+
+class _DeferredDeduplicator:
+    def __init__(self, dedup):
+        self.dedup = dedup
+        self.updates = []
+
+    def __call__(self, df):
+        kept, update = self.dedup._filter(df)
+        self.updates.append(update)
+
+        return kept
+
+    def commit(self):
+        for update in self.updates:
+            self.dedup._register(*update)
+
+        self.updates = []
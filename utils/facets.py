@@ -0,0 +1,132 @@
+import copy
+
+import numpy as np
+import streamlit as st
+
+from utils.aggregates import CountryAggregates
+
+#------------------------------------------------------------------------------------------------------------
+# Índices de bitmap para os filtros da sidebar
+#
+# Além do país, as páginas podem filtrar por cidade, tipo de preço, cor da nota, reserva de mesa e entrega
+# online. Para cada valor dessas colunas (e do país) é guardado um bitmap (int do Python) com as posições das
+# linhas que têm o valor. Uma combinação de filtros vira OR dos valores escolhidos em cada coluna e AND entre
+# colunas, sem varrer a base.
+#
+# As linhas filtradas alimentam um CountryAggregates próprio (ver filtered_aggregates), então todas as
+# páginas continuam consultando agregados por país. Sem filtros vale o agregado global. No modo streaming
+# as linhas não ficam em memória e os filtros não são exibidos.
+
+FACET_COLUMNS = ['City', 'Price Type', 'Color Name', 'Has Table booking', 'Has Online delivery']
+
+# Colunas indexadas: as dos filtros adicionais e o país (filtro principal das páginas)
+INDEX_COLUMNS = ['Country Name'] + FACET_COLUMNS
+
+# Rótulos das colunas 0/1
+YES_NO = {1: 'Yes', 0: 'No'}
+BOOLEAN_FACETS = ['Has Table booking', 'Has Online delivery']
+
+def _bitmap(positions):
+    bits = np.zeros(positions.max() + 1 if len(positions) else 0, dtype='bool')
+    bits[positions] = True
+
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+class FacetIndex:
+    def __init__(self, df):
+        self.rows = 0
+        self.bitmaps = {column: {} for column in INDEX_COLUMNS}
+
+        self.add_rows(df)
+
+    # As linhas novas ocupam as posições seguintes às já indexadas (mesma ordem da base do store)
+    def add_rows(self, rows):
+        # Dicionários novos em vez de alterados: as cópias de snapshot() continuam com as linhas que tinham
+        updated = {}
+        for column in INDEX_COLUMNS:
+            bitmaps = updated[column] = dict(self.bitmaps[column])
+
+            for value, positions in rows.groupby(column, sort=False, observed=True).indices.items():
+                bitmaps[value] = bitmaps.get(value, 0) | (_bitmap(positions) << self.rows)
+
+        self.bitmaps = updated
+        self.rows += len(rows)
+
+        return self
+
+    # Cópia rasa com as linhas indexadas até agora, que não muda com os lotes seguintes (ver StoreVersion em
+    # utils/ingest.py)
+    def snapshot(self):
+        return copy.copy(self)
+
+    def values(self, column):
+        return sorted(self.bitmaps[column])
+
+    def _union(self, column, values):
+        union = 0
+        for value in values:
+            union |= self.bitmaps[column].get(value, 0)
+
+        return union
+
+    # Bitmap das linhas que passam por todos os filtros ({coluna: valores}; lista vazia = sem filtro). Os
+    # países selecionados (`countries`) restringem sempre: seleção vazia = nenhuma linha
+    def bitmap(self, facets, countries=None):
+        result = (1 << self.rows) - 1
+
+        for column, values in facets.items():
+            if values:
+                result &= self._union(column, values)
+
+        if countries is not None:
+            result &= self._union('Country Name', countries)
+
+        return result
+
+    # Máscara booleana por posição das linhas filtradas
+    def mask(self, facets, countries=None):
+        bitmap = self.bitmap(facets, countries)
+        data = np.frombuffer(bitmap.to_bytes((self.rows + 7) // 8, 'little'), dtype='uint8')
+
+        return np.unpackbits(data, bitorder='little')[:self.rows].astype('bool')
+
+    def positions(self, facets, countries=None):
+        return np.flatnonzero(self.mask(facets, countries))
+
+def build_facet_index(df):
+    if df is None:
+        return None
+
+    return FacetIndex(df)
+
+# Chave dos filtros ativos (entra na chave do cache das páginas)
+def facet_key(facets):
+    return frozenset((column, frozenset(values)) for column, values in facets.items() if values)
+
+#------------------------------------------------------------------------------------------------------------
+# Sidebar e agregados filtrados
+
+def facet_sidebar(index):
+    if index is None:
+        return {}
+
+    facets = {}
+    with st.expander('More filters'):
+        for column in FACET_COLUMNS:
+            format_func = YES_NO.get if column in BOOLEAN_FACETS else str
+            facets[column] = st.multiselect(f'{column}:', options=index.values(column), format_func=format_func)
+
+    return facets
+
+# Agregados por país só das linhas filtradas, guardados no cache de resultados das páginas. `df`, o índice e o
+# cache vêm da mesma versão da base (ver get_store em utils/data.py)
+def filtered_aggregates(df, aggregates, index, facets, cache):
+    key = facet_key(facets)
+
+    if index is None or not key:
+        return aggregates
+
+    return cache.get_or_compute(
+        ('facets', key),
+        lambda: CountryAggregates(df.iloc[index.positions(facets)])
+    )
@@ -0,0 +1,68 @@
+import numpy as np
+
+#------------------------------------------------------------------------------------------------------------
+# Consultas por distância
+#
+# "Restaurantes a até X km de um ponto" e "N restaurantes mais próximos" usam o GridIndex do mapa (ver
+# utils/maps.py): o círculo vira um retângulo de latitude/longitude, o índice devolve só as linhas das
+# células desse retângulo e a distância exata (haversine, vetorizada) é calculada apenas para elas.
+# `mask` aplica os filtros da página (países, facetas, nota mínima) sobre as posições da base completa.
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Meia circunferência da Terra: nenhuma distância é maior que isso
+MAX_DISTANCE_KM = np.pi * EARTH_RADIUS_KM
+
+# Raio inicial da busca dos mais próximos, dobrado até achar N restaurantes
+NEAREST_START_KM = 1.0
+
+def haversine_km(lat, lon, lat0, lon0):
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+# Retângulo (south, west, north, east) que contém o círculo. Perto dos polos, ou com raios muito grandes,
+# o círculo cobre todas as longitudes
+def radius_bounds(lat, lon, radius_km):
+    dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = lat - dlat, lat + dlat
+
+    if south <= -90 or north >= 90:
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+
+    dlon = np.degrees(np.arcsin(min(np.sin(radius_km / EARTH_RADIUS_KM) / np.cos(np.radians(lat)), 1.0)))
+    if radius_km >= MAX_DISTANCE_KM / 2 or dlon >= 180:
+        return south, -180.0, north, 180.0
+
+    return south, lon - dlon, north, lon + dlon
+
+# Posições e distâncias (km) dos restaurantes a até radius_km do ponto, do mais próximo ao mais distante
+def within_radius(index, lat, lon, radius_km, mask=None):
+    rows = index.query(radius_bounds(lat, lon, radius_km))
+
+    if mask is not None:
+        rows = rows[mask[rows]]
+
+    distances = haversine_km(*index.coordinates(rows), lat, lon)
+    inside = distances <= radius_km
+    rows, distances = rows[inside], distances[inside]
+
+    order = np.lexsort((rows, distances))
+
+    return rows[order], distances[order]
+
+# Os n restaurantes mais próximos do ponto. O raio dobra até conter n restaurantes: todos os que estão
+# fora do círculo ficam mais longe que o n-ésimo encontrado, então o resultado é exato
+def nearest(index, lat, lon, n, mask=None, start_km=NEAREST_START_KM):
+    radius_km = start_km
+
+    while True:
+        rows, distances = within_radius(index, lat, lon, radius_km, mask)
+
+        if len(rows) >= n or radius_km >= MAX_DISTANCE_KM:
+            return rows[:n], distances[:n]
+
+        radius_km = min(radius_km * 2, MAX_DISTANCE_KM)
@@ -0,0 +1,267 @@
+import glob
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.data import INCOMING_DIR, clean_data, cleaning_steps
+from utils.dedup import FINGERPRINT_COLUMNS, KEY_COLUMN, Deduplicator
+from utils.schema import append_compact, compact
+
+#------------------------------------------------------------------------------------------------------------
+# Ingestão incremental de lotes de restaurantes
+#
+# Os lotes diários chegam como CSVs no mesmo formato de dataset/zomato.csv. Basta colocá-los em
+# dataset/incoming/: no próximo rerun de uma página (get_store) cada arquivo ainda não visto é
+# incorporado, em ordem alfabética:
+#   - a limpeza roda só sobre as linhas do lote;
+#   - restaurantes já existentes são descartados pelo mesmo Deduplicator da carga da base (índice de
+#     Restaurant ID), que também registra duplicatas e versões conflitantes;
+#   - estruturas derivadas com add_rows(rows), como os agregados por país, incorporam só as linhas novas;
+#     as demais são descartadas e reconstruídas no próximo acesso.
+#
+# A base guardada usa o esquema compacto (ver utils/schema.py); cada lote é limpo e deduplicado com os tipos
+# do CSV e só então compactado com as categorias da base (append_compact), sem recompactar a base inteira.
+#
+# No modo streaming (ver utils/streaming.py) o store não guarda as linhas (df=None): só os agregados já
+# dobrados a partir do CSV, recebidos em `indexes`, e os lotes lidos com as mesmas colunas/dtypes (`dtype`).
+#
+# Um lote só altera o store depois de limpo por inteiro: faltando colunas ou falhando uma etapa da limpeza,
+# nenhum restaurante dele fica registrado na deduplicação. Um CSV com problema na pasta de entrada fica
+# registrado como falho em `batches` (com o erro), sem interromper as páginas.
+#
+# Cada resumo em `batches` guarda o tamanho e a data de modificação do arquivo lido. Um arquivo alterado
+# depois disso (falho ou não) é lido de novo: os restaurantes já incorporados voltam como duplicatas e só os
+# novos entram. Assim um CSV pego no meio de uma cópia não perde o restante; para não ler pela metade,
+# arquivos modificados há menos de INCOMING_SETTLE_SECONDS esperam a próxima varredura. O jeito seguro de
+# publicar um lote é copiá-lo com outro nome (ex.: lote.csv.partial, ignorado pelo glob de *.csv) e
+# renomeá-lo para .csv no fim da cópia.
+
+# Arquivos da pasta de entrada modificados há menos que isso ainda podem estar sendo copiados: ficam para a
+# próxima varredura
+INCOMING_SETTLE_SECONDS = 5
+
+# Colunas do CSV exigidas em cada lote (no modo streaming, as colunas de `dtype`)
+BATCH_COLUMNS = [KEY_COLUMN] + FINGERPRINT_COLUMNS
+
+# Tamanho e data de modificação: identificam a versão do arquivo que foi lida
+def _file_state(path):
+    stat = os.stat(path)
+
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def _index_name(builder):
+    return f'{builder.__module__}.{builder.__qualname__}'
+
+class RestaurantStore:
+    def __init__(self, df, dedup=None, indexes=None, dtype=None):
+        self.version = 0
+
+        # Índice (hash) Restaurant ID -> impressão digital dos restaurantes já presentes na base. As impressões
+        # digitais usam os tipos do CSV, então o registro vem antes da compactação
+        self.dedup = dedup if dedup is not None else Deduplicator().seed(df)
+        self.df = compact(df) if df is not None else None
+
+        # Colunas e dtypes dos lotes (None = todas as colunas do CSV)
+        self.dtype = dtype
+
+        # Lotes já incorporados e resumo de cada um
+        self.batches = {}
+
+        self._indexes = {_index_name(builder): value for builder, value in (indexes or {}).items()}
+        self._lock = threading.RLock()
+
+        # Um lock por estrutura em construção: só quem pede a mesma estrutura espera por ela
+        self._build_locks = {}
+
+    # Estrutura derivada da base, construída no primeiro acesso e mantida entre reruns e sessões.
+    #
+    # A construção (ex.: índice de busca, segundos em bases grandes) roda fora do lock do store, então as
+    # demais sessões continuam lendo outras estruturas e recebendo lotes. Se um lote chegar durante a
+    # construção, as linhas novas são incorporadas com add_rows (ou a estrutura é construída de novo)
+    def index(self, builder):
+        return self._index(builder)[0]
+
+    # A estrutura e a versão da base que ela cobre, lidas juntas sob o lock. Estruturas com snapshot() (índices
+    # por posição das linhas) saem como cópia, que não muda com os lotes seguintes
+    def _index(self, builder):
+        name = _index_name(builder)
+
+        def current(value):
+            return (value.snapshot() if hasattr(value, 'snapshot') else value), self.version
+
+        with self._lock:
+            if name in self._indexes:
+                return current(self._indexes[name])
+
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if name in self._indexes:
+                    return current(self._indexes[name])
+
+                df, version = self.df, self.version
+
+            while True:
+                value = builder(df)
+
+                with self._lock:
+                    if self.version != version and hasattr(value, 'add_rows') and df is not None:
+                        value.add_rows(self.df.iloc[len(df):])
+                    elif self.version != version:
+                        df, version = self.df, self.version
+                        continue
+
+                    self._indexes[name] = value
+
+                    return current(value)
+
+    # Versão atual da base para um rerun (ver StoreVersion)
+    def pin(self):
+        with self._lock:
+            return StoreVersion(self, self.df, self.version)
+
+    # Constrói a estrutura numa thread em segundo plano (ex.: índice de busca ao abrir a página), sem segurar
+    # o rerun; quem pedir a estrutura antes do fim da construção (index) espera só o tempo que falta
+    def warm(self, builder):
+        name = _index_name(builder)
+
+        with self._lock:
+            build_lock = self._build_locks.get(name)
+            if name in self._indexes or (build_lock is not None and build_lock.locked()):
+                return
+
+        threading.Thread(target=self.index, args=(builder,), name=f'warm {name}', daemon=True).start()
+
+    def append(self, batch):
+        columns = list(self.dtype) if self.dtype is not None else BATCH_COLUMNS
+        missing = [column for column in columns if column not in batch.columns]
+        if missing:
+            raise ValueError(f'batch is missing columns: {", ".join(missing)}')
+
+        with self._lock:
+            dedup = self.dedup.deferred()
+            rows = clean_data(batch, cleaning_steps(dedup))
+
+            df = self.df
+            if df is not None and len(rows):
+                start = df.index.max() + 1 if len(df) else 0
+                rows.index = pd.RangeIndex(start, start + len(rows))
+
+                df = append_compact(df, rows)
+
+            # Daqui em diante o lote é incorporado: registra os restaurantes novos e atualiza as estruturas. Um
+            # lote só com restaurantes já existentes não muda a base nem as estruturas
+            before = self.dedup.report()
+            dedup.commit()
+            after = self.dedup.report()
+
+            if len(rows):
+                self.df = df
+                self.version += 1
+
+                for name, value in list(self._indexes.items()):
+                    if hasattr(value, 'add_rows'):
+                        value.add_rows(rows)
+                    else:
+                        del self._indexes[name]
+
+            return {
+                'status': 'ok',
+                'rows': len(batch),
+                'added': len(rows),
+                'duplicates': after['duplicates'] - before['duplicates'],
+                'conflicts': after['conflicts'] - before['conflicts'],
+                'skipped': len(batch) - len(rows),
+            }
+
+    def append_file(self, path):
+        with self._lock:
+            if self._pending(path):
+                usecols = list(self.dtype) if self.dtype is not None else None
+
+                # Estado lido antes do arquivo: se ele ainda crescer durante a leitura, a próxima varredura
+                # percebe a mudança e lê de novo
+                state = _file_state(path)
+                batch = pd.read_csv(path, usecols=usecols, dtype=self.dtype)
+                self.batches[path] = {**self.append(batch), **state}
+
+            return self.batches[path]
+
+    # Arquivo ainda não incorporado na versão atual: novo, ou alterado (tamanho/mtime) desde a última leitura,
+    # tenha ela falhado ou não
+    def _pending(self, path):
+        summary = self.batches.get(path)
+
+        if summary is None:
+            return True
+
+        state = _file_state(path)
+        return (state['size'], state['mtime']) != (summary['size'], summary['mtime'])
+
+    # Incorpora os CSVs da pasta de entrada ainda não vistos ou alterados. Arquivos modificados há menos de
+    # settle_seconds ficam para uma próxima varredura (podem estar sendo copiados). O erro de um arquivo fica
+    # no seu resumo e não impede os demais
+    def ingest_incoming(self, directory=INCOMING_DIR, settle_seconds=INCOMING_SETTLE_SECONDS):
+        paths = sorted(glob.glob(os.path.join(directory, '*.csv')))
+        results = []
+
+        for path in paths:
+            with self._lock:
+                try:
+                    if not self._pending(path):
+                        continue
+                    state = _file_state(path)
+                except FileNotFoundError:
+                    # Removido ou renomeado depois do glob
+                    continue
+
+                if time.time() - state['mtime'] < settle_seconds:
+                    continue
+
+                try:
+                    results.append(self.append_file(path))
+                except Exception as error:
+                    self.batches[path] = {'status': 'failed', 'error': f'{type(error).__name__}: {error}', **state}
+                    results.append(self.batches[path])
+
+        return results
+
+#------------------------------------------------------------------------------------------------------------
+# Uma versão da base por rerun
+#
+# Outra sessão pode incorporar um lote no meio de um rerun. Para a página não misturar versões (ex.: `df`
+# de antes do lote e o índice de filtros de depois, com máscaras de tamanhos diferentes), cada rerun fixa
+# uma versão com RestaurantStore.pin() e pega dela a base e todas as estruturas:
+#   - estruturas por posição das linhas com snapshot() (filtros, busca) saem como cópia da versão fixada;
+#   - as sem add_rows (grade do mapa, caches de resultados) são as compartilhadas quando são da mesma versão;
+#   - se o store já estiver numa versão mais nova, essas estruturas são construídas só para este rerun
+#     sobre `df` (caso raro: um lote chegando exatamente durante o rerun);
+#   - os agregados por país não dependem da posição das linhas e são compartilhados como estão: podem já
+#     incluir um lote mais novo que `df`, o que só adianta os números até o próximo rerun.
+
+class StoreVersion:
+    def __init__(self, store, df, version):
+        self.store = store
+        self.df = df
+        self.version = version
+
+        self._values = {}
+
+    def index(self, builder):
+        name = _index_name(builder)
+
+        if name not in self._values:
+            value, version = self.store._index(builder)
+
+            if version != self.version and (hasattr(value, 'snapshot') or not hasattr(value, 'add_rows')):
+                value = builder(self.df)
+
+            self._values[name] = value
+
+        return self._values[name]
+
+    def warm(self, builder):
+        self.store.warm(builder)
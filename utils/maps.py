@@ -0,0 +1,271 @@
+import folium
+import numpy as np
+from folium.utilities import JsCode
+
+#------------------------------------------------------------------------------------------------------------
+# Camada de restaurantes do mapa
+#
+# Em vez de um folium.CircleMarker (com seu próprio Popup HTML) por restaurante, todos os pontos vão em uma
+# única camada GeoJSON montada direto dos arrays das colunas. O Leaflet cria os círculos no navegador.
+#
+# Cada ponto carrega apenas a cor e o Restaurant ID: os detalhes do restaurante clicado são buscados no
+# servidor (restaurant_details) e exibidos abaixo do mapa, em vez de um popup HTML embutido por ponto.
+
+# Casas decimais das coordenadas enviadas ao navegador (5 casas ~ 1 metro)
+COORD_DECIMALS = 5
+
+POPUP_FIELDS = ['Restaurant ID']
+
+# Colunas exibidas no detalhe do restaurante clicado
+DETAIL_COLUMNS = ['Restaurant Name', 'Country Name', 'City', 'Cuisines', 'Aggregate rating', 'Votes']
+
+# A cor de cada círculo vem da propriedade `color` do ponto
+_STYLE_FROM_PROPERTIES = JsCode('''
+function(feature, layer) {
+    layer.setStyle({color: feature.properties.color, fillColor: feature.properties.color});
+}
+''')
+
+def restaurant_geojson(df, fields=POPUP_FIELDS):
+    # Coordenadas em float32 na base (ver utils/schema.py): arredondadas em float64 para sair com 5 casas
+    lats = df['Latitude'].to_numpy(dtype='float64').round(COORD_DECIMALS).tolist()
+    lons = df['Longitude'].to_numpy(dtype='float64').round(COORD_DECIMALS).tolist()
+    colors = ('#' + df['Rating color'].astype(str)).tolist()
+    columns = [df[field].tolist() for field in fields]
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'color': color, **dict(zip(fields, values))},
+        }
+        for lat, lon, color, *values in zip(lats, lons, colors, *columns)
+    ]
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+def restaurant_layer(df):
+    return folium.GeoJson(
+        restaurant_geojson(df),
+        name='Restaurants',
+        marker=folium.CircleMarker(radius=4, fill=True, fill_opacity=0.9),
+        on_each_feature=_STYLE_FROM_PROPERTIES,
+        popup=folium.GeoJsonPopup(fields=POPUP_FIELDS, max_width=300),
+    )
+
+# Índice Restaurant ID -> detalhes, montado uma única vez por carga da base (ver get_index)
+def build_restaurant_lookup(df):
+    return df.drop_duplicates(subset='Restaurant ID').set_index('Restaurant ID')[DETAIL_COLUMNS]
+
+# Restaurant ID do último ponto clicado, a partir do valor devolvido pelo st_folium
+def clicked_restaurant_id(map_value):
+    feature = (map_value or {}).get('last_active_drawing') or {}
+
+    return (feature.get('properties') or {}).get('Restaurant ID')
+
+def restaurant_details(lookup, restaurant_id):
+    if restaurant_id is None or restaurant_id not in lookup.index:
+        return None
+
+    return lookup.loc[restaurant_id]
+
+#------------------------------------------------------------------------------------------------------------
+# Nível de detalhe do mapa (LOD)
+#
+# O mapa só recebe o que está visível: com zoom baixo (ou muitos pontos na tela) vão agregados por célula
+# de uma grade proporcional ao zoom; com zoom alto vão os restaurantes individuais dentro do retângulo
+# visível. O GridIndex é montado uma única vez por carga da base (ver get_index em utils/data.py) e guarda
+# posições de linha da base completa, então o filtro de países é aplicado como máscara sobre o resultado.
+
+# Zoom a partir do qual os restaurantes aparecem individualmente
+POINTS_MIN_ZOOM = 9
+
+# Máximo de pontos individuais enviados por rerun; acima disso o mapa continua agregado
+MAX_POINTS = 5000
+
+# Tamanho aproximado (em pixels) de cada célula de agregação
+CLUSTER_CELL_PX = 64
+
+# Células da grade espacial, em graus
+GRID_CELL_DEG = 1.0
+
+def cluster_cell_deg(zoom):
+    # Um tile de 256 px cobre 360 / 2**zoom graus de longitude
+    return CLUSTER_CELL_PX * 360 / (256 * 2 ** zoom)
+
+# Coordenadas guardadas em float32, como na base (ver utils/schema.py); as contas de célula e as comparações
+# com o retângulo são feitas em float64 só para as linhas consultadas (coordinates). A grade guarda 16 bytes
+# por restaurante, além das coordenadas
+class GridIndex:
+    def __init__(self, lat, lon, cell_deg=GRID_CELL_DEG):
+        self.lat = np.asarray(lat, dtype='float32')
+        self.lon = np.asarray(lon, dtype='float32')
+        self.cell_deg = cell_deg
+        self.n_cols = int(np.ceil(360 / cell_deg))
+
+        # Linhas ordenadas por célula: cada faixa de células de uma mesma linha da grade é contígua
+        lat, lon = self.coordinates()
+        cells = self._cell_id(self._grid_row(lat), self._grid_col(lon)).astype('int32')
+        self.order = np.argsort(cells, kind='stable').astype('int32')
+        self.sorted_cells = cells[self.order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    # Latitudes e longitudes em float64 das linhas `rows` (todas por padrão)
+    def coordinates(self, rows=None):
+        if rows is None:
+            return self.lat.astype('float64'), self.lon.astype('float64')
+
+        return self.lat[rows].astype('float64'), self.lon[rows].astype('float64')
+
+    def _grid_row(self, lat):
+        return np.clip(((lat + 90) // self.cell_deg).astype('int64'), 0, int(np.ceil(180 / self.cell_deg)) - 1)
+
+    def _grid_col(self, lon):
+        return np.clip(((lon + 180) // self.cell_deg).astype('int64'), 0, self.n_cols - 1)
+
+    def _cell_id(self, row, col):
+        return row * self.n_cols + col
+
+    def _query_range(self, south, north, west, east):
+        rows = range(int(self._grid_row(np.float64(south))), int(self._grid_row(np.float64(north))) + 1)
+        col_west = int(self._grid_col(np.float64(west)))
+        col_east = int(self._grid_col(np.float64(east)))
+
+        slices = []
+        for row in rows:
+            start = np.searchsorted(self.sorted_cells, self._cell_id(row, col_west), side='left')
+            stop = np.searchsorted(self.sorted_cells, self._cell_id(row, col_east), side='right')
+            slices.append(self.order[start:stop])
+
+        candidates = np.concatenate(slices) if slices else np.empty(0, dtype='int32')
+
+        # Refinamento exato dentro das células de borda
+        lat, lon = self.coordinates(candidates)
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+
+        return candidates[inside]
+
+    # Posições (na base completa) dos restaurantes dentro do retângulo; bounds=None devolve todos
+    def query(self, bounds=None):
+        if bounds is None:
+            return np.arange(len(self))
+
+        south, west, north, east = bounds
+        south, north = max(south, -90.0), min(north, 90.0)
+
+        # O Leaflet devolve longitudes fora de [-180, 180] quando o mapa dá a volta no globo
+        if east - west >= 360:
+            return self._query_range(south, north, -180.0, 180.0)
+
+        west = (west + 180) % 360 - 180
+        east = (east + 180) % 360 - 180
+
+        if west <= east:
+            return self._query_range(south, north, west, east)
+
+        return np.concatenate([
+            self._query_range(south, north, west, 180.0),
+            self._query_range(south, north, -180.0, east),
+        ])
+
+def build_grid_index(df):
+    return GridIndex(df['Latitude'].to_numpy(), df['Longitude'].to_numpy())
+
+# Converte o valor devolvido pelo st_folium em (south, west, north, east)
+def view_bounds(bounds):
+    if not bounds:
+        return None
+
+    south_west, north_east = bounds.get('_southWest') or {}, bounds.get('_northEast') or {}
+    values = [south_west.get('lat'), south_west.get('lng'), north_east.get('lat'), north_east.get('lng')]
+
+    if any(value is None for value in values):
+        return None
+
+    return tuple(float(value) for value in values)
+
+# Célula de agregação de cada coordenada para o zoom
+def cluster_keys(lat, lon, zoom):
+    cell = cluster_cell_deg(zoom)
+    row = ((lat + 90) // cell).astype('int64')
+    col = ((lon + 180) // cell).astype('int64')
+
+    return row * (int(360 // cell) + 1) + col
+
+# As chaves das células são calculadas só para as linhas visíveis, no mesmo custo do np.unique
+def cluster_geojson(index, rows, zoom, ratings):
+    lat, lon = index.coordinates(rows)
+    keys, inverse = np.unique(cluster_keys(lat, lon, zoom), return_inverse=True)
+
+    counts = np.bincount(inverse, minlength=len(keys))
+    lats = np.bincount(inverse, weights=lat, minlength=len(keys)) / counts
+    lons = np.bincount(inverse, weights=lon, minlength=len(keys)) / counts
+    mean_ratings = np.bincount(inverse, weights=ratings[rows], minlength=len(keys)) / counts
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon, COORD_DECIMALS), round(lat, COORD_DECIMALS)]},
+            'properties': {'Restaurants': count, 'Nota média': round(rating, 2)},
+        }
+        for lat, lon, count, rating in zip(lats.tolist(), lons.tolist(), counts.tolist(), mean_ratings.tolist())
+    ]
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+# O raio de cada agregado cresce com o log da quantidade de restaurantes
+_CLUSTER_RADIUS = JsCode('''
+function(feature, layer) {
+    layer.setRadius(6 + 3 * Math.log10(feature.properties['Restaurants']));
+}
+''')
+
+def cluster_layer(index, rows, zoom, ratings):
+    return folium.GeoJson(
+        cluster_geojson(index, rows, zoom, ratings),
+        name='Restaurants',
+        marker=folium.CircleMarker(color='#4C78A8', fill=True, fill_color='#4C78A8', fill_opacity=0.6, weight=1),
+        on_each_feature=_CLUSTER_RADIUS,
+        tooltip=folium.GeoJsonTooltip(fields=['Restaurants', 'Nota média']),
+        zoom_on_click=True,
+    )
+
+# Camada do mapa para o zoom e retângulo visíveis; `mask` é a máscara booleana do filtro sobre a base
+def viewport_layer(df, index, mask, zoom, bounds):
+    rows = index.query(bounds)
+    rows = rows[mask[rows]]
+
+    # Nenhum restaurante visível: camada vazia (tooltip e popup exigem ao menos um ponto com os campos)
+    if len(rows) == 0:
+        return folium.GeoJson({'type': 'FeatureCollection', 'features': []})
+
+    if zoom >= POINTS_MIN_ZOOM and len(rows) <= MAX_POINTS:
+        return restaurant_layer(df.iloc[np.sort(rows)])
+
+    zoom = min(max(int(zoom), 0), POINTS_MIN_ZOOM - 1)
+
+    return cluster_layer(index, rows, zoom, df['Aggregate rating'].to_numpy(dtype='float64'))
+
+#------------------------------------------------------------------------------------------------------------
+# Busca por proximidade (ver utils/geo.py)
+
+NEARBY_COLOR = '#1f6fb4'
+
+# Círculo da busca e restaurantes encontrados, destacados sobre a camada principal. O popup mantém o
+# Restaurant ID, então o clique nesses pontos também mostra os detalhes
+def nearby_layer(df, rows, center, radius_km):
+    layer = folium.FeatureGroup(name='Nearby')
+
+    folium.Circle(location=center, radius=radius_km * 1000, color=NEARBY_COLOR, weight=2, fill=False).add_to(layer)
+
+    if len(rows):
+        folium.GeoJson(
+            restaurant_geojson(df.iloc[rows], fields=POPUP_FIELDS + ['Restaurant Name']),
+            marker=folium.CircleMarker(radius=7, color=NEARBY_COLOR, fill=True, fill_color=NEARBY_COLOR, fill_opacity=0.9),
+            tooltip=folium.GeoJsonTooltip(fields=['Restaurant Name'], labels=False),
+            popup=folium.GeoJsonPopup(fields=POPUP_FIELDS, max_width=300),
+        ).add_to(layer)
+
+    return layer
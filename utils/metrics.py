@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#------------------------------------------------------------------------------------------------------------
+# Tempos de cada execução das páginas
+#
+# Cada página abre um registro no início do script (start_trace) e o fecha no fim (finish_trace). Entre os
+# dois, blocos `with span('nome'):` somam o tempo gasto em cada etapa: leitura do CSV e limpeza (só na carga),
+# construção dos índices, filtros, consultas, figuras e mapa. `span` funciona em qualquer módulo e não faz
+# nada fora de uma execução de página (benchmarks, CLIs). Spans com o mesmo nome são somados, e o tempo de um
+# span inclui o dos spans abertos dentro dele.
+#
+# O registro fechado vai para o painel opcional da sidebar (debug_panel) e é acrescentado a METRICS_PATH,
+# uma linha JSON por execução, junto com os contadores dos caches da página (entradas, memória, acertos,
+# faltas e remoções, ver LRUCache.stats em utils/cache.py). Quando o arquivo passa de METRICS_MAX_BYTES ele é
+# renomeado para METRICS_PATH + '.1' (substituindo o anterior) e um novo é iniciado, então o disco usado fica
+# limitado a duas vezes esse tamanho. O resumo por página (p50/p99 da execução e de cada span) lê os dois
+# arquivos e sai pelo CLI, como tabela ou no formato texto do Prometheus (para o textfile collector do
+# node_exporter):
+#
+#     python -m utils.metrics
+#     python -m utils.metrics --format prometheus --out metrics/fome_zero.prom
+
+METRICS_PATH = 'metrics/reruns.jsonl'
+
+# Tamanho máximo do arquivo de métricas antes da rotação
+METRICS_MAX_BYTES = 10 * 1024 ** 2
+
+# Execuções recentes por página usadas nos percentis do painel
+HISTORY_SIZE = 500
+
+QUANTILES = [0.5, 0.99]
+
+# Cada sessão roda o script da página na sua própria thread
+_local = threading.local()
+_write_lock = threading.Lock()
+_history = defaultdict(lambda: deque(maxlen=HISTORY_SIZE))
+
+class Trace:
+    def __init__(self, page):
+        self.page = page
+        self.start = time.perf_counter()
+        self.seconds = {}
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0) + seconds
+
+    def record(self):
+        return {
+            'time': round(time.time(), 3),
+            'page': self.page,
+            'total_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'spans': {name: round(seconds * 1000, 3) for name, seconds in self.seconds.items()},
+        }
+
+def start_trace(page):
+    _local.trace = Trace(page)
+
+    return _local.trace
+
+@contextmanager
+def span(name):
+    trace = getattr(_local, 'trace', None)
+
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+# Fecha o registro da execução atual, guarda no histórico da página e no arquivo de métricas. `caches`
+# ({nome: LRUCache}) acrescenta ao registro os contadores de cada cache
+def finish_trace(path=METRICS_PATH, caches=None):
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+
+    if trace is None:
+        return None
+
+    record = trace.record()
+    if caches:
+        record['caches'] = {name: cache.stats() for name, cache in caches.items()}
+
+    _history[trace.page].append(record['total_ms'])
+    write_record(record, path)
+
+    return record
+
+def rotated_path(path):
+    return path + '.1'
+
+def write_record(record, path=METRICS_PATH, max_bytes=METRICS_MAX_BYTES):
+    if path is None:
+        return
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+
+    with _write_lock:
+        if os.path.exists(path) and os.path.getsize(path) + len(line.encode('utf-8')) > max_bytes:
+            os.replace(path, rotated_path(path))
+
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+#------------------------------------------------------------------------------------------------------------
+# Painel da sidebar
+
+def debug_panel(record):
+    if record is None:
+        return
+
+    with st.sidebar:
+        if not st.checkbox('Show timings', value=False):
+            return
+
+        spans = pd.DataFrame({
+            'Span': list(record['spans']),
+            'Time (ms)': list(record['spans'].values()),
+        }).sort_values('Time (ms)', ascending=False)
+
+        st.markdown(f"**This rerun:** {record['total_ms']:.1f} ms")
+        st.dataframe(spans, use_container_width=True, hide_index=True)
+
+        totals = np.array(_history[record['page']])
+        p50, p99 = np.percentile(totals, [q * 100 for q in QUANTILES])
+        st.caption(f'Last {len(totals)} reruns of this page: p50 {p50:.1f} ms | p99 {p99:.1f} ms')
+
+        if record.get('caches'):
+            st.markdown('**Caches** (since the dataset was loaded)')
+            st.dataframe(cache_table(record['caches']), use_container_width=True)
+
+def cache_table(caches):
+    table = pd.DataFrame.from_dict(caches, orient='index')
+    lookups = table['hits'] + table['misses']
+
+    return table.assign(**{
+        'MB': (table.pop('bytes') / 1024 ** 2).round(2),
+        'hit rate': (table['hits'] / lookups.where(lookups > 0)).round(3),
+    })
+
+#------------------------------------------------------------------------------------------------------------
+# Resumo do arquivo de métricas
+
+# O arquivo rotacionado (execuções mais antigas) entra antes do atual
+def load_records(path=METRICS_PATH):
+    paths = [name for name in (rotated_path(path), path) if os.path.exists(name)] or [path]
+
+    records = []
+    for name in paths:
+        with open(name, encoding='utf-8') as file:
+            records += [json.loads(line) for line in file if line.strip()]
+
+    # Uma linha por (execução, span); a execução inteira entra como o span 'total'
+    return pd.DataFrame([
+        {'page': record['page'], 'span': name, 'ms': ms}
+        for record in records
+        for name, ms in [('total', record['total_ms']), *record['spans'].items()]
+    ], columns=['page', 'span', 'ms'])
+
+def summarize(records):
+    grouped = records.groupby(['page', 'span'])['ms']
+    summary = grouped.quantile(QUANTILES).unstack()
+    summary.columns = [f'p{int(q * 100)} (ms)' for q in QUANTILES]
+
+    return summary.assign(**{'count': grouped.count(), 'sum (ms)': grouped.sum()}).round(3)
+
+def _labels(page, name, **extra):
+    labels = {'page': page, **({} if name == 'total' else {'span': name}), **extra}
+
+    return ','.join(f'{key}="{value}"' for key, value in labels.items())
+
+# Formato texto do Prometheus: um summary para a execução inteira e outro por span, em segundos
+def prometheus_text(summary):
+    lines = []
+
+    for metric, spans in [('fome_zero_rerun_seconds', ['total']), ('fome_zero_span_seconds', None)]:
+        lines.append(f'# TYPE {metric} summary')
+
+        for (page, name), row in summary.iterrows():
+            if (name == 'total') != (spans is not None):
+                continue
+
+            for q in QUANTILES:
+                value = row[f'p{int(q * 100)} (ms)'] / 1000
+                lines.append(f'{metric}{{{_labels(page, name, quantile=q)}}} {value:.6f}')
+            lines.append(f'{metric}_sum{{{_labels(page, name)}}} {row["sum (ms)"] / 1000:.6f}')
+            lines.append(f'{metric}_count{{{_labels(page, name)}}} {int(row["count"])}')
+
+    return '\n'.join(lines) + '\n'
+
+#------------------------------------------------------------------------------------------------------------
+# CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize page rerun timings (p50/p99 per page and span).')
+    parser.add_argument('--path', default=METRICS_PATH, help='JSON-lines metrics file, read with its rotated .1 file (default: %(default)s)')
+    parser.add_argument('--format', choices=['table', 'prometheus'], default='table', help='output format (default: %(default)s)')
+    parser.add_argument('--out', help='write to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    summary = summarize(load_records(args.path))
+    text = summary.to_string() + '\n' if args.format == 'table' else prometheus_text(summary)
+
+    if args.out is None:
+        print(text, end='')
+        return
+
+    # Troca o arquivo de uma vez: o coletor nunca lê um arquivo pela metade
+    partial = args.out + '.partial'
+    with open(partial, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(partial, args.out)
+
+if __name__ == '__main__':
+    main()
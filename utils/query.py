@@ -0,0 +1,78 @@
+import time
+
+import pandas as pd
+
+#------------------------------------------------------------------------------------------------------------
+# Camada de consultas das páginas
+#
+# Cada página declara as etapas de que precisa como funções nomeadas: as intermediárias (@queries.step) e as
+# que viram gráficos/tabelas (@queries.output). Uma etapa recebe a execução `q` e lê os parâmetros e as
+# outras etapas por nome (q['selected'], q['city_stats']). Dentro de uma execução cada etapa é calculada uma
+# única vez e reaproveitada por todas as etapas que a usam.
+#
+#     queries = Queries()
+#
+#     @queries.step
+#     def city_stats(q):
+#         return aggregates.city_stats(q['selected'])
+#
+#     @queries.output
+#     def df_agg_unique(q):
+#         return q['city_stats']['Cuisines Unique'].reset_index()
+#
+#     view, query_stats = queries.run(selected=selected_countries)
+#
+# query_stats mostra, por etapa, quantas vezes ela foi usada e o tempo de cálculo; etapas usadas mais de
+# uma vez são as compartilhadas.
+
+class QueryRun:
+    def __init__(self, steps, params):
+        self.steps = steps
+        self.params = params
+        self.results = {}
+        self.uses = {}
+        self.seconds = {}
+
+    def __getitem__(self, name):
+        if name in self.params:
+            return self.params[name]
+
+        self.uses[name] = self.uses.get(name, 0) + 1
+
+        if name not in self.results:
+            start = time.perf_counter()
+            self.results[name] = self.steps[name](self)
+            self.seconds[name] = time.perf_counter() - start
+
+        return self.results[name]
+
+    # O tempo de cada etapa inclui o das etapas calculadas dentro dela
+    def stats(self):
+        return pd.DataFrame({
+            'Step': list(self.uses),
+            'Uses': list(self.uses.values()),
+            'Shared': [uses > 1 for uses in self.uses.values()],
+            'Time (ms)': [round(self.seconds[name] * 1000, 3) for name in self.uses],
+        })
+
+class Queries:
+    def __init__(self):
+        self.steps = {}
+        self.outputs = []
+
+    def step(self, func):
+        self.steps[func.__name__] = func
+
+        return func
+
+    def output(self, func):
+        self.outputs.append(func.__name__)
+
+        return self.step(func)
+
+    # Calcula todas as saídas declaradas; devolve {saída: resultado} e as estatísticas da execução
+    def run(self, **params):
+        run = QueryRun(self.steps, params)
+        results = {name: run[name] for name in self.outputs}
+
+        return results, run.stats()
@@ -0,0 +1,113 @@
+import argparse
+
+import pandas as pd
+
+#------------------------------------------------------------------------------------------------------------
+# Esquema compacto da base em memória
+#
+# A base tratada fica em memória durante todo o processo (ver utils/data.py), então as colunas usam os tipos
+# mais estreitos que comportam os valores:
+#   - textos que se repetem entre restaurantes (país, cidade, localidade, moeda, cor/texto da nota, tipo de
+#     preço, culinárias) viram categorias: um código inteiro por linha e cada texto guardado uma vez;
+#   - inteiros de faixa pequena são reduzidos, e as colunas 0/1 de serviços viram booleanas;
+#   - coordenadas em float32 (~1 m de precisão, o mapa envia 5 casas decimais).
+#
+# Nome e endereço continuam como texto (quase todo valor é distinto). Aggregate rating e o custo em dólar
+# continuam em float64, usados nas médias.
+#
+# O esquema vale só para a base completa guardada no RestaurantStore (ver utils/ingest.py): os pedaços da
+# leitura e os lotes novos são limpos e deduplicados com os tipos do CSV, e só depois compactados. Agrupamentos
+# sobre colunas categóricas usam observed=True (apenas os valores presentes nas linhas).
+#
+# Comparar a memória por coluna antes e depois do esquema:
+#
+#     python -m utils.schema
+#     python -m utils.schema --csv dataset/bench/synthetic_x100.csv
+
+COMPACT_SCHEMA = {
+    'Country Code': 'int16',
+    'Average Cost for two': 'int32',
+    'Price range': 'int8',
+    'Votes': 'int32',
+    'Has Table booking': 'bool',
+    'Has Online delivery': 'bool',
+    'Is delivering now': 'bool',
+    'Switch to order menu': 'bool',
+    'Latitude': 'float32',
+    'Longitude': 'float32',
+    'Country Name': 'category',
+    'City': 'category',
+    'Locality': 'category',
+    'Locality Verbose': 'category',
+    'Cuisines': 'category',
+    'Currency': 'category',
+    'Rating color': 'category',
+    'Rating text': 'category',
+    'Price Type': 'category',
+    'Color Name': 'category',
+    'Cuisines Unique': 'category',
+}
+
+# Colunas já no tipo do esquema (ex.: base lida do snapshot, ver utils/snapshot.py) não são convertidas de novo
+def compact(df):
+    dtypes = {
+        column: dtype for column, dtype in COMPACT_SCHEMA.items()
+        if column in df.columns and df[column].dtype != dtype
+    }
+
+    return df.astype(dtypes) if dtypes else df
+
+# Base compacta `df` com as linhas novas ao final. O lote é compactado com os dtypes da base; as colunas
+# categóricas da base só ganham as categorias novas do lote (os códigos das linhas existentes não mudam), então
+# o concat junta códigos em vez de recriar as categorias da base inteira a cada lote
+def append_compact(df, rows):
+    rows = compact(rows)
+    head, tail = {}, {}
+
+    for column in df.columns:
+        head[column], tail[column] = df[column], rows[column]
+
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            new = tail[column].cat.categories.difference(head[column].cat.categories)
+            if len(new):
+                head[column] = head[column].cat.add_categories(new)
+
+        tail[column] = tail[column].astype(head[column].dtype)
+
+    return pd.concat([pd.DataFrame(head), pd.DataFrame(tail)])
+
+# Memória (deep, inclui os textos) de cada coluna da base original e da compactada
+def memory_report(df, compacted=None):
+    compacted = compact(df) if compacted is None else compacted
+
+    before = df.memory_usage(deep=True, index=False)
+    after = compacted.memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({
+        'Dtype': df.dtypes.astype(str),
+        'Compact dtype': compacted.dtypes.astype(str),
+        'Before (MB)': before / 1024 ** 2,
+        'After (MB)': after / 1024 ** 2,
+    })
+    report.loc['Total'] = ['', '', report['Before (MB)'].sum(), report['After (MB)'].sum()]
+    report['Ratio'] = report['Before (MB)'] / report['After (MB)']
+
+    return report.round({'Before (MB)': 2, 'After (MB)': 2, 'Ratio': 1})
+
+#------------------------------------------------------------------------------------------------------------
+# CLI
+
+def main(argv=None):
+    from utils.data import DATA_PATH, load_data
+
+    parser = argparse.ArgumentParser(description='Print the per-column memory of the cleaned dataset before and after the compact schema.')
+    parser.add_argument('--csv', default=DATA_PATH, help='source CSV (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    df = load_data(args.csv)
+
+    print(f'{len(df)} rows from {args.csv}')
+    print(memory_report(df).to_string())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------------------------------------
+# Busca de restaurantes por nome e endereço
+#
+# Índice invertido de trigramas sobre Restaurant Name, Locality e Address. O texto de cada restaurante é
+# normalizado (minúsculas, sem acentos, só letras/números separados por um espaço) e cada palavra começa
+# com um espaço, então os trigramas de uma palavra da busca, como " bu", "bur", "urg", também são trigramas
+# de qualquer palavra que comece com ela (busca por prefixo).
+#
+# A nota de um restaurante é a fração dos trigramas das palavras da busca que aparecem no seu texto: 1.0
+# quando todas as palavras da busca são prefixos de palavras do texto; erros de digitação perdem só alguns
+# trigramas e continuam acima de FUZZY_MIN_SCORE (busca aproximada). Empates favorecem quem tem a busca no
+# nome (o nome também tem um índice próprio).
+#
+# Os trigramas são extraídos de forma vetorizada (texto como matriz de bytes) e guardados em formato CSR
+# (trigrama -> posições das linhas). Cada pedaço de BUILD_CHUNK_SIZE linhas, inclusive dos lotes novos, vira
+# um segmento já ordenado, consultado junto com os demais; nada é reordenado globalmente. As posições são
+# relativas ao início do segmento (uint16) e os códigos e ponteiros ficam em int32. A normalização roda só
+# sobre os valores distintos de cada coluna (nomes e endereços se repetem entre filiais).
+#
+# Na busca, uma linha com a nota mínima (`need` dos k trigramas da busca) tem pelo menos um dos k - need + 1
+# trigramas mais raros do segmento: só as listas desses geram candidatos, e os trigramas comuns (" ca",
+# "res") apenas conferem os candidatos por busca binária, sem concatenar listas longas.
+
+SEARCH_COLUMNS = ['Restaurant Name', 'Locality', 'Address']
+
+# Fração mínima dos trigramas da busca presentes no texto
+FUZZY_MIN_SCORE = 0.6
+
+# Linhas processadas por vez na construção (a matriz de bytes tem linhas x maior texto). É também o tamanho
+# de cada segmento, então precisa caber nas posições uint16
+BUILD_CHUNK_SIZE = 50_000
+
+# Cada valor distinto é normalizado uma única vez. Colunas categóricas (ver utils/schema.py) são convertidas
+# para texto antes do fillna
+def normalize(texts):
+    codes, uniques = pd.factorize(texts.astype('object'), use_na_sentinel=False)
+    uniques = (
+        pd.Series(uniques, dtype='object').fillna('').astype(str)
+        .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.lower()
+        .str.replace(r'[^a-z0-9]+', ' ', regex=True)
+        .str.strip()
+    )
+
+    return pd.Series((' ' + uniques).to_numpy()[codes], index=texts.index, dtype='object')
+
+# Trigramas (código de 24 bits) de cada texto, sem repetições, ordenados por código e posição
+def _trigram_keys(texts):
+    data = texts.to_numpy().astype('S')
+
+    if data.dtype.itemsize < 3:
+        return np.array([], dtype='int64')
+
+    chars = np.frombuffer(data.tobytes(), dtype='uint8').reshape(len(data), data.dtype.itemsize).astype('int32')
+    codes = chars[:, :-2] << 16 | chars[:, 1:-1] << 8 | chars[:, 2:]
+
+    # Bytes nulos completam os textos mais curtos que a matriz
+    valid = chars[:, 2:] != 0
+    positions = np.broadcast_to(np.arange(len(data))[:, None], codes.shape)
+
+    keys = np.sort(codes[valid].astype('int64') << 32 | positions[valid])
+
+    return keys[np.append(True, keys[1:] != keys[:-1])]
+
+class _Segment:
+    def __init__(self, keys, offset):
+        trigrams = keys >> 32
+        starts = np.flatnonzero(np.diff(trigrams, prepend=-1))
+
+        self.offset = offset
+        self.codes = trigrams[starts].astype('int32')
+        self.indptr = np.append(starts, len(keys)).astype('int32')
+        self.positions = (keys & 0xFFFFFFFF).astype('uint16')
+
+    # Posições (locais, crescentes) das linhas com cada trigrama
+    def postings(self, codes):
+        found = np.searchsorted(self.codes, codes)
+
+        return [
+            self.positions[self.indptr[i]:self.indptr[i + 1]]
+            if i < len(self.codes) and self.codes[i] == code else self.positions[:0]
+            for i, code in zip(found, codes)
+        ]
+
+def _segments(text, offset):
+    return [
+        _Segment(_trigram_keys(text.iloc[start:start + BUILD_CHUNK_SIZE]), offset + start)
+        for start in range(0, len(text), BUILD_CHUNK_SIZE)
+    ]
+
+# Em quantas listas de posições (crescentes) cada candidato aparece
+def _counts(postings, candidates):
+    counts = np.zeros(len(candidates), dtype='int32')
+
+    for posting in postings:
+        if len(posting):
+            found = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+            counts += posting[found] == candidates
+
+    return counts
+
+class SearchIndex:
+    def __init__(self, df):
+        self.rows = 0
+        self.segments = []
+        self.name_segments = []
+
+        self.add_rows(df)
+
+    # As linhas novas ocupam as posições seguintes às já indexadas (mesma ordem da base do store)
+    def add_rows(self, rows):
+        if len(rows) == 0:
+            return self
+
+        name = normalize(rows[SEARCH_COLUMNS[0]])
+        text = name
+        for column in SEARCH_COLUMNS[1:]:
+            text = text + normalize(rows[column])
+
+        # Listas novas em vez de alteradas: as cópias de snapshot() continuam com as linhas que tinham
+        self.segments = self.segments + _segments(text, self.rows)
+        self.name_segments = self.name_segments + _segments(name, self.rows)
+        self.rows += len(rows)
+
+        return self
+
+    # Cópia rasa com as linhas indexadas até agora, que não muda com os lotes seguintes (ver StoreVersion em
+    # utils/ingest.py)
+    def snapshot(self):
+        return copy.copy(self)
+
+    # Posições e notas dos melhores resultados (nota decrescente, nome, depois ordem da base). `mask` limita
+    # a busca às linhas selecionadas nos filtros
+    def search(self, query, limit=20, mask=None, min_score=FUZZY_MIN_SCORE):
+        empty = np.array([], dtype='int64'), np.array([], dtype='float64')
+
+        # Trigramas de cada palavra separadamente (a ordem das palavras não importa)
+        words = normalize(pd.Series([query])).iloc[0].split()
+        codes = np.unique(_trigram_keys(' ' + pd.Series(words, dtype='object')) >> 32)
+
+        k = len(codes)
+        need = next((count for count in range(1, k + 1) if count / k >= min_score), None)
+
+        if k == 0 or need is None or not self.segments:
+            return empty
+
+        positions, counts, name_counts = [], [], []
+        for segment, name_segment in zip(self.segments, self.name_segments):
+            postings = sorted(segment.postings(codes), key=len)
+            candidates = np.unique(np.concatenate(postings[:k - need + 1]))
+
+            if mask is not None:
+                candidates = candidates[mask[segment.offset + candidates.astype('int64')]]
+
+            matched = _counts(postings, candidates)
+            keep = matched >= need
+            candidates = candidates[keep]
+
+            positions.append(segment.offset + candidates.astype('int64'))
+            counts.append(matched[keep])
+            name_counts.append(_counts(name_segment.postings(codes), candidates))
+
+        positions = np.concatenate(positions)
+        scores = np.concatenate(counts) / k
+        name_scores = np.concatenate(name_counts)
+
+        order = np.lexsort((positions, -name_scores, -scores))[:limit]
+
+        return positions[order], scores[order]
+
+def build_search_index(df):
+    return SearchIndex(df)
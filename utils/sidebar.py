@@ -0,0 +1,15 @@
+import streamlit as st
+
+#------------------------------------------------------------------------------------------------------------
+# Recarga manual da base
+#
+# A Home só mostra texto e o logo, então não importa utils.data (pandas, numpy, deduplicação) na abertura:
+# o módulo só é carregado quando o botão é clicado.
+
+# Descarta a base, os índices e os resultados guardados; o próximo acesso de qualquer página relê os arquivos
+def reload_data_button():
+    if st.sidebar.button('Reload data', help='Discard the loaded dataset, indexes and cached results'):
+        from utils.data import clear_data_cache
+
+        clear_data_cache()
+        st.sidebar.success('Data will be reloaded on the next page view.')
@@ -0,0 +1,120 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from utils.data import DATA_PATH, SNAPSHOT_PATH, load_data
+from utils.dedup import Deduplicator, fingerprint
+from utils.schema import COMPACT_SCHEMA, compact
+
+#------------------------------------------------------------------------------------------------------------
+# Snapshot colunar da base tratada
+#
+# O snapshot é um arquivo Arrow IPC sem compressão com a base já limpa e com as colunas derivadas
+# (Country Name, Price Type, Color Name, Cuisines Unique) materializadas. Por não ter compressão, ele é
+# lido via memory-map, sem parse de texto.
+#
+# A base é gravada no esquema compacto (ver utils/schema.py), então a carga não refaz a compactação. As
+# colunas de texto são gravadas com dicionário (cada texto distinto uma vez + um código por linha), e a
+# carga as converte direto em categorias, sem criar uma string Python por linha: o custo da carga acompanha
+# o número de textos distintos, não o de linhas. As colunas de texto fora das categorias do esquema compacto
+# (nome, endereço) voltam a texto por um take dos códigos. As colunas numéricas não são copiadas: apontam
+# para o memory-map e são somente leitura, como toda a base compartilhada (ver utils/data.py).
+#
+# A impressão digital de cada linha (ver utils/dedup.py) também é gravada, calculada sobre os tipos do CSV:
+# a carga registra os restaurantes na deduplicação sem recalcular os hashes.
+#
+# O arquivo é gravado ao lado e trocado de uma vez, então um processo com o snapshot antigo mapeado continua
+# lendo o arquivo antigo.
+#
+# Gerar/atualizar o snapshot a partir do CSV:
+#
+#     python -m utils.snapshot
+#     python -m utils.snapshot --csv dataset/zomato.csv --out dataset/zomato.arrow
+
+# Versão do formato, gravada nos metadados do arquivo. Deve ser incrementada sempre que a limpeza, as colunas
+# ou os tipos gravados mudarem: um snapshot de outra versão é ignorado (ver _data_source em utils/data.py) e
+# a base volta a ser lida do CSV até o snapshot ser regerado
+SNAPSHOT_VERSION = 4
+
+VERSION_KEY = b'fome_zero.snapshot_version'
+
+FINGERPRINT_FIELD = '_fingerprint'
+
+CATEGORY_COLUMNS = [column for column, dtype in COMPACT_SCHEMA.items() if dtype == 'category']
+
+# Os textos fora das categorias do esquema (nome, endereço) também são gravados com dicionário. As categorias
+# ficam em ordem alfabética, como em compact(): a ordem define a dos groupbys e precisa ser a mesma da base
+# lida do CSV
+def _dictionary_encode(df):
+    return df.astype({column: 'category' for column in df.select_dtypes(include=['object']).columns})
+
+def build_snapshot(csv_path=DATA_PATH, out_path=SNAPSHOT_PATH, dedup=None):
+    df = load_data(csv_path, dedup)
+
+    # preserve_index mantém o índice original das linhas (exibido na tabela Top 10)
+    table = pa.Table.from_pandas(_dictionary_encode(compact(df)), preserve_index=True)
+    table = table.append_column(FINGERPRINT_FIELD, pa.array(fingerprint(df)))
+    table = table.replace_schema_metadata({
+        **table.schema.metadata,
+        VERSION_KEY: str(SNAPSHOT_VERSION).encode(),
+    })
+
+    partial = out_path + '.partial'
+    with pa.OSFile(partial, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(partial, out_path)
+
+    return table.num_rows
+
+# `dedup` recebe os restaurantes da base, com as impressões digitais gravadas
+def load_snapshot(path=SNAPSHOT_PATH, dedup=None):
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    hashes = table.column(FINGERPRINT_FIELD).to_numpy()
+    df = table.drop_columns([FINGERPRINT_FIELD]).to_pandas(split_blocks=True)
+
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and column not in CATEGORY_COLUMNS:
+            df[column] = df[column].to_numpy()
+
+    if dedup is not None:
+        dedup.seed(df, hashes)
+
+    return df
+
+# Versão gravada no snapshot (None para arquivos sem versão ou ilegíveis)
+def snapshot_version(path):
+    try:
+        with pa.memory_map(path, 'r') as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    version = metadata.get(VERSION_KEY)
+
+    return int(version) if version is not None else None
+
+#------------------------------------------------------------------------------------------------------------
+# CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the cleaned columnar snapshot of the restaurant dataset.')
+    parser.add_argument('--csv', default=DATA_PATH, help='source CSV (default: %(default)s)')
+    parser.add_argument('--out', default=SNAPSHOT_PATH, help='snapshot file to write (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    dedup = Deduplicator()
+    rows = build_snapshot(args.csv, args.out, dedup)
+    report = dedup.report()
+
+    print(f'{rows} rows written to {args.out} in {time.perf_counter() - start:.2f}s')
+    print(f"{report['duplicates']} duplicate rows and {report['conflicts']} conflicting versions dropped")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import time
+
+from utils.aggregates import CountryAggregates, build_country_aggregates
+from utils.data import DATA_PATH, read_clean_chunks
+from utils.dedup import Deduplicator
+from utils.ingest import RestaurantStore
+
+#------------------------------------------------------------------------------------------------------------
+# Modo streaming (out-of-core)
+#
+# As páginas Countries, Cities e Cuisines só leem os agregados por país (ver utils/aggregates.py), então
+# para arquivos que não cabem em memória o CSV é lido em pedaços, só com as colunas usadas na limpeza e nos
+# agregados e com dtypes explícitos, e cada pedaço tratado é dobrado nos agregados e descartado. Ficam em
+# memória os agregados e o índice de deduplicação (16 bytes por restaurante).
+#
+# Address, Locality, Locality Verbose, Rating text e as colunas de serviço não são lidas. Por isso a
+# impressão digital da deduplicação usa só as colunas lidas (ver utils/dedup.py).
+#
+# Agregar um CSV e ver o resumo:
+#
+#     python -m utils.streaming --csv dataset/zomato.csv
+
+STREAM_DTYPES = {
+    'Restaurant ID': 'int64',
+    'Restaurant Name': 'object',
+    'Country Code': 'int16',
+    'City': 'object',
+    'Longitude': 'float64',
+    'Latitude': 'float64',
+    'Cuisines': 'object',
+    'Average Cost for two': 'int64',
+    'Currency': 'object',
+    'Price range': 'int8',
+    'Aggregate rating': 'float64',
+    'Rating color': 'object',
+    'Votes': 'int64',
+}
+STREAM_COLUMNS = list(STREAM_DTYPES)
+
+# Pedaços maiores que os da carga normal: o custo fixo por pedaço (groupbys dos parciais) é diluído
+STREAM_CHUNK_SIZE = 1_000_000
+
+def stream_aggregates(path=DATA_PATH, dedup=None, chunksize=STREAM_CHUNK_SIZE):
+    aggregates = CountryAggregates()
+
+    for chunk in read_clean_chunks(path, dedup, chunksize, usecols=STREAM_COLUMNS, dtype=STREAM_DTYPES):
+        aggregates.add_rows(chunk)
+
+    return aggregates
+
+# Store sem linhas: só os agregados, que também recebem os lotes novos (ver utils/ingest.py)
+def stream_store(path=DATA_PATH, chunksize=STREAM_CHUNK_SIZE):
+    dedup = Deduplicator()
+    aggregates = stream_aggregates(path, dedup, chunksize)
+
+    return RestaurantStore(None, dedup, indexes={build_country_aggregates: aggregates}, dtype=STREAM_DTYPES)
+
+#------------------------------------------------------------------------------------------------------------
+# CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate a restaurant CSV in streaming mode and print a summary.')
+    parser.add_argument('--csv', default=DATA_PATH, help='source CSV (default: %(default)s)')
+    parser.add_argument('--chunksize', type=int, default=STREAM_CHUNK_SIZE, help='rows per chunk (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    dedup = Deduplicator()
+    aggregates = stream_aggregates(args.csv, dedup, args.chunksize)
+    countries = aggregates.countries.index
+    report = dedup.report()
+
+    print(f"{report['rows']} rows aggregated from {args.csv} in {time.perf_counter() - start:.2f}s")
+    print(f"{report['kept']} restaurants in {len(countries)} countries and {len(aggregates.cities)} cities")
+    print(f"{report['duplicates']} duplicate rows and {report['conflicts']} conflicting versions dropped")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data import DATA_PATH
+
+#------------------------------------------------------------------------------------------------------------
+# Base sintética no esquema da Zomato
+#
+# Gera arquivos de qualquer tamanho com as mesmas 21 colunas (e a mesma ordem) de dataset/zomato.csv, para
+# testar as páginas com carga. Cada restaurante novo parte de um restaurante real sorteado (o "modelo"), o que
+# mantém as distribuições conjuntas da base: peso de cada país e cidade, culinárias por país, moeda, custo e
+# faixa de preço, serviços, e a relação entre nota, cor/texto da nota e votos. Sobre o modelo:
+#
+# - Restaurant ID: sequencial a partir do maior ID real, sem colisões entre pedaços;
+# - Restaurant Name: nomes de rede (que aparecem mais de uma vez na base) são mantidos; os demais viram uma
+#   combinação de palavras de nomes reais do mesmo país, então a fração de redes se mantém e o número de
+#   nomes distintos cresce com o arquivo;
+# - Latitude/Longitude: deslocadas em torno do ponto do modelo, com desvio proporcional à dispersão da
+#   cidade (os pontos continuam concentrados nos mesmos bairros);
+# - Votes: multiplicados por um ruído log-normal (nota e votos continuam correlacionados).
+#
+# Cada restaurante gerado se repete tantas vezes quanto o seu modelo na base real (mesmo Restaurant ID e
+# mesmos valores, como as duplicatas da base), o que mantém a taxa de duplicatas e também onde elas se
+# concentram. As repetições ficam no mesmo pedaço, em posições sorteadas. O arquivo é escrito pedaço a
+# pedaço: a memória usada depende de `chunksize`, não do total de linhas.
+#
+#     python -m utils.synthetic --rows 100000000 --out dataset/synthetic.csv
+
+SYNTHETIC_CHUNK_SIZE = 1_000_000
+
+# Desvio das coordenadas: fração da dispersão da cidade, limitada em graus (~100 m a ~2 km)
+JITTER_FRACTION = 0.25
+MIN_JITTER_DEGREES = 0.001
+MAX_JITTER_DEGREES = 0.02
+
+# Desvio do logaritmo do ruído multiplicativo dos votos
+VOTES_SIGMA = 0.25
+
+# Restaurantes sorteados a mais por pedaço, para cobrir a variação do número de repetições
+ROWS_SLACK = 0.01
+
+# Palavras por nome novo: duas, às vezes três
+THIRD_WORD_RATE = 0.3
+
+class SyntheticProfile:
+    def __init__(self, path=DATA_PATH):
+        raw = pd.read_csv(path)
+        self.columns = list(raw.columns)
+
+        # Duplicatas da base: repetições exatas de um Restaurant ID
+        duplicated = raw['Restaurant ID'].duplicated()
+
+        templates = raw[~duplicated].reset_index(drop=True)
+        self.templates = templates
+        self.copies = templates['Restaurant ID'].map(raw['Restaurant ID'].value_counts()).to_numpy()
+        self.next_id = int(templates['Restaurant ID'].max()) + 1
+
+        names = templates['Restaurant Name']
+        self.chain = names.duplicated(keep=False).to_numpy()
+
+        # Palavras dos nomes reais de cada país
+        words = names.str.split().explode().dropna()
+        words = words[words.str.len() > 1]
+        self.words = {
+            country: group.unique()
+            for country, group in words.groupby(templates['Country Code'].reindex(words.index))
+        }
+
+        spread = templates.groupby('City')[['Latitude', 'Longitude']].transform('std').fillna(0).to_numpy()
+        self.jitter = np.clip(spread * JITTER_FRACTION, MIN_JITTER_DEGREES, MAX_JITTER_DEGREES)
+
+    # Nomes novos para as linhas de um país: combinação de palavras de nomes reais do país
+    def _names(self, rng, country, n):
+        words = self.words[country]
+        names = pd.Series(words[rng.integers(len(words), size=n)], dtype='object')
+        names = names + ' ' + words[rng.integers(len(words), size=n)]
+
+        third = rng.random(n) < THIRD_WORD_RATE
+        names[third] = names[third] + ' ' + words[rng.integers(len(words), size=third.sum())]
+
+        return names.to_numpy()
+
+    # `n` linhas, com Restaurant IDs a partir de `first_id` para os restaurantes novos
+    def chunk(self, rng, n, first_id):
+        # Restaurantes suficientes para `n` linhas contando as repetições (com folga); as linhas a mais são
+        # descartadas
+        unique = int(np.ceil(n / self.copies.mean() * (1 + ROWS_SLACK))) + 1
+
+        picks = rng.integers(len(self.templates), size=unique)
+        rows = self.templates.iloc[picks].reset_index(drop=True)
+
+        rows['Restaurant ID'] = np.arange(first_id, first_id + unique)
+
+        renamed = ~self.chain[picks]
+        countries = rows['Country Code'].to_numpy()
+        names = rows['Restaurant Name'].to_numpy(dtype='object')
+        for country in np.unique(countries[renamed]):
+            target = renamed & (countries == country)
+            names[target] = self._names(rng, country, target.sum())
+        rows['Restaurant Name'] = names
+
+        # Coordenadas 0/0 (sem localização na base) continuam sem localização
+        jitter = self.jitter[picks] * rng.standard_normal((unique, 2))
+        located = (rows[['Latitude', 'Longitude']] != 0).any(axis=1).to_numpy()
+        rows['Latitude'] = np.where(located, rows['Latitude'] + jitter[:, 0], 0).clip(-90, 90).round(7)
+        rows['Longitude'] = np.where(located, rows['Longitude'] + jitter[:, 1], 0).clip(-180, 180).round(7)
+
+        votes = rows['Votes'].to_numpy()
+        noisy = np.maximum(np.rint(votes * rng.lognormal(0, VOTES_SIGMA, unique)), 1).astype('int64')
+        rows['Votes'] = np.where(votes > 0, noisy, 0)
+
+        rows = rows.iloc[np.repeat(np.arange(unique), self.copies[picks])]
+        rows = rows.iloc[rng.permutation(len(rows))[:n]][self.columns]
+        next_id = first_id + unique
+
+        if len(rows) < n:
+            missing, next_id = self.chunk(rng, n - len(rows), next_id)
+            rows = pd.concat([rows, missing])
+
+        return rows, next_id
+
+def generate(out, rows, path=DATA_PATH, chunksize=SYNTHETIC_CHUNK_SIZE, seed=0):
+    profile = SyntheticProfile(path)
+    rng = np.random.default_rng(seed)
+    next_id = profile.next_id
+    restaurants = 0
+
+    for start in range(0, rows, chunksize):
+        chunk, next_id = profile.chunk(rng, min(chunksize, rows - start), next_id)
+        chunk.to_csv(out, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        restaurants += chunk['Restaurant ID'].nunique()
+
+    return restaurants
+
+#------------------------------------------------------------------------------------------------------------
+# CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic restaurant CSV with the schema and distributions of the real one.')
+    parser.add_argument('--rows', type=int, required=True, help='rows to write, duplicates included')
+    parser.add_argument('--out', required=True, help='destination CSV')
+    parser.add_argument('--csv', default=DATA_PATH, help='real CSV used as the model (default: %(default)s)')
+    parser.add_argument('--chunksize', type=int, default=SYNTHETIC_CHUNK_SIZE, help='rows per chunk (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    restaurants = generate(args.out, args.rows, args.csv, args.chunksize, args.seed)
+
+    print(f'{args.rows} rows ({restaurants} restaurants) written to {args.out} in {time.perf_counter() - start:.2f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+from utils.metrics import span
+from utils.query import Queries
+
+#------------------------------------------------------------------------------------------------------------
+# Resultados das páginas sem Streamlit
+#
+# Cada página monta seus gráficos e tabelas a partir de uma função que recebe os agregados por país (ver
+# utils/aggregates.py) e a seleção da sidebar e devolve {nome: resultado}. As funções não leem widgets nem
+# caches, então também rodam fora do dashboard (ver benchmarks/pages.py); as páginas só guardam o resultado
+# no cache de resultados (ver utils/cache.py).
+
+# =====================================
+# OVERVIEW
+# =====================================
+# KPIs, centro do mapa e máscara (por posição da base) dos restaurantes dos países selecionados que passam
+# pelos filtros da sidebar. A máscara sai dos bitmaps do FacetIndex (país incluso), sem varrer a base
+def overview_view(aggregates, facet_index, selected, facets=None):
+    with span('facet_mask'):
+        country_mask = facet_index.mask(facets or {}, countries=selected)
+
+    return {
+        'kpis': aggregates.overview_kpis(selected),
+        'map_center': aggregates.map_center(selected),
+        'country_mask': country_mask,
+    }
+
+# =====================================
+# COUNTRIES
+# =====================================
+# Indicadores por país dos países selecionados
+def countries_view(aggregates, selected):
+    country_stats = aggregates.country_stats(selected)
+
+    return {
+        'df_register_country': (
+            country_stats['Restaurant ID']
+            .reset_index()
+            .sort_values(by='Restaurant ID', ascending=False)
+        ),
+        'df_register_city': (
+            country_stats['City']
+            .reset_index()
+            .sort_values(by='City', ascending=False)
+        ),
+        'mean_country': (
+            country_stats['Mean Votes']
+            .reset_index()
+            .sort_values(by='Mean Votes', ascending=False)
+        ),
+        'plate_avg': (
+            country_stats['Average Cost for two (USD)']
+            .round(2)
+            .reset_index()
+            .sort_values(by='Average Cost for two (USD)', ascending=False)
+        ),
+    }
+
+# =====================================
+# CITIES
+# =====================================
+# Todos os gráficos partem dos indicadores por cidade dos países selecionados, calculados uma única vez por
+# execução (ver utils/query.py)
+city_queries = Queries()
+
+@city_queries.step
+def city_stats(q):
+    return q['aggregates'].city_stats(q['selected'])
+
+@city_queries.output
+def df_rest_country(q):
+    return (
+        q['city_stats']['Restaurants']
+        .rename('Aggregate rating')
+        .reset_index()
+        .sort_values(by='Aggregate rating', ascending=False)
+        .head(10)
+    )
+
+@city_queries.output
+def df_agg_fil(q):
+    city_stats = q['city_stats']
+
+    return (
+        city_stats.loc[city_stats['Above 4'] > 0, 'Above 4']
+        .rename('Aggregate rating')
+        .reset_index()
+        .sort_values(by='Aggregate rating', ascending=False)
+        .head(7)
+    )
+
+@city_queries.output
+def df_agg_fil2(q):
+    city_stats = q['city_stats']
+
+    return (
+        city_stats.loc[city_stats['Below 2.5'] > 0, 'Below 2.5']
+        .rename('Aggregate rating')
+        .reset_index()
+        .sort_values(by='Aggregate rating', ascending=False)
+        .head(7)
+    )
+
+@city_queries.output
+def df_agg_unique(q):
+    return (
+        q['city_stats']['Cuisines Unique']
+        .reset_index()
+        .sort_values(by='Cuisines Unique', ascending=False)
+        .head(10)
+    )
+
+@city_queries.output
+def df_cuisine_cities(q):
+    return (
+        q['aggregates'].cuisine_cities(q['selected'], q['cuisine'])
+        .reset_index()
+        .sort_values(by='Restaurants', ascending=False)
+        .head(10)
+    )
+
+# Devolve os resultados e as estatísticas da execução das consultas
+def cities_view(aggregates, selected, cuisine):
+    return city_queries.run(aggregates=aggregates, selected=selected, cuisine=cuisine)
+
+# =====================================
+# CUISINES
+# =====================================
+# Consulta ao ranking por culinária (ver CountryAggregates.cuisine_leaderboard)
+def filter_kpi(leaderboard, cuisine, position='Best'):
+    if cuisine not in leaderboard.index:
+        return {'Restaurant': 'N/A', 'Rating': 'N/A'}
+
+    leader = leaderboard.loc[cuisine, position]
+
+    return {
+        'Restaurant': leader['Restaurant Name'],
+        'Rating': leader['Aggregate rating']
+    }
+
+MAIN_CUISINES = ['Italian', 'American', 'Japanese', 'Indian', 'Chinese']
+
+# KPIs, Top 10 e notas por culinária dos países selecionados. `listed` vale para os KPIs, o ranking e as notas
+# por culinária; o Top 10 não depende da culinária
+def cuisines_view(aggregates, selected, listed=False):
+    cuisine_ratings = aggregates.cuisine_ratings(selected, listed)
+    leaderboard = aggregates.cuisine_leaderboard(selected, listed)
+
+    return {
+        'kpis': {cuisine: filter_kpi(leaderboard, cuisine) for cuisine in MAIN_CUISINES},
+        'leaderboard': leaderboard,
+        'df_top10': aggregates.top_restaurants(selected, 10),
+        'best_cuisines': (
+            cuisine_ratings
+            .reset_index()
+            .sort_values(by='Aggregate rating', ascending=False)
+            .head(10)
+        ),
+        'bottom_cuisine': (
+            cuisine_ratings
+            .drop('Drinks Only', errors='ignore')
+            .reset_index()
+            .sort_values(by='Aggregate rating', ascending=True)
+            .head(10)
+        ),
+    }